@@ -0,0 +1,58 @@
+"""
+Measure how long importing the add-on's widget modules takes, as Orange does
+during widget discovery. Each module is imported in a fresh interpreter so
+that results are not skewed by modules already loaded by a previous import.
+
+    python benchmarks/import_time.py [--repeat N]
+"""
+import argparse
+import pkgutil
+import statistics
+import subprocess
+import sys
+import time
+
+import orangecontrib.imagenets.widgets as widgets
+
+HEAVY_MODULES = ("tensorflow", "keras", "cv2", "sklearn", "pyqtgraph")
+
+PROBE = """
+import sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+heavy = [m for m in {heavy!r} if m in sys.modules]
+print(elapsed, ",".join(heavy))
+"""
+
+
+def time_import(module):
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY_MODULES)],
+        check=True, capture_output=True, text=True).stdout.split()
+    return float(out[0]), out[1] if len(out) > 1 else ""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    modules = [widgets.__name__] + [
+        f"{widgets.__name__}.{info.name}"
+        for info in pkgutil.iter_modules(widgets.__path__) if info.name.startswith("ow_")]
+
+    start = time.perf_counter()
+    for module in modules:
+        times = []
+        heavy = ""
+        for _ in range(args.repeat):
+            elapsed, heavy = time_import(module)
+            times.append(elapsed)
+        print(f"{module:60s} {statistics.median(times) * 1000:8.1f} ms"
+              f"  heavy imports: {heavy or 'none'}")
+    print(f"total wall time: {time.perf_counter() - start:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from orangecontrib.imagenets.util.image_cache import ImageTensorCache
+
+
+class TestImageTensorCache(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.source = os.path.join(self._tmp.name, "a.png")
+        with open(self.source, "wb") as f:
+            f.write(b"image")
+        self.directory = os.path.join(self._tmp.name, "cache")
+        self.loads = 0
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def load(self, value=1, shape=(4, 4, 3)):
+        def load():
+            self.loads += 1
+            return np.full(shape, value, dtype=np.uint8)
+        return load
+
+    def test_memory_hits(self):
+        cache = ImageTensorCache()
+        first = cache.get_or_load(self.source, (4, 4), False, self.load())
+        second = cache.get_or_load(self.source, (4, 4), False, self.load())
+        self.assertIs(first, second)
+        self.assertEqual(self.loads, 1)
+        cache.get_or_load(self.source, (4, 4), True, self.load())
+        cache.get_or_load(self.source, (8, 8), False, self.load())
+        self.assertEqual(self.loads, 3)
+
+    def test_changed_or_missing_source(self):
+        cache = ImageTensorCache()
+        cache.get_or_load(self.source, (4, 4), False, self.load())
+        with open(self.source, "wb") as f:
+            f.write(b"edited image")
+        cache.get_or_load(self.source, (4, 4), False, self.load())
+        self.assertEqual(self.loads, 2)
+        missing = os.path.join(self._tmp.name, "missing.png")
+        self.assertIsNone(cache.get_or_load(missing, (4, 4), False, self.load()))
+        self.assertEqual(self.loads, 2)
+
+    def test_known_signature(self):
+        cache = ImageTensorCache()
+        cache.get_or_load(self.source, (4, 4), False, self.load())
+        st = os.stat(self.source)
+        cache.get_or_load(self.source, (4, 4), False, self.load(),
+                          signature=(st.st_mtime_ns, st.st_size))
+        self.assertEqual(self.loads, 1)
+
+    def test_unreadable_images_are_not_stored(self):
+        cache = ImageTensorCache()
+        self.assertIsNone(cache.get_or_load(self.source, (4, 4), False, lambda: None))
+        self.assertEqual(len(cache._memory), 0)
+
+    def test_memory_budget(self):
+        cache = ImageTensorCache(memory_bytes=100)
+        img = np.zeros(40, dtype=np.uint8)
+        for i in range(3):
+            cache.put(i, img)
+        self.assertEqual(list(cache._memory), [1, 2])
+        cache.get(1)
+        cache.put(3, img)
+        self.assertEqual(list(cache._memory), [1, 3])
+        cache.put(4, np.zeros(200, dtype=np.uint8))
+        self.assertIsNone(cache.get(4))
+
+    def test_disk_tier_outlives_the_instance(self):
+        ImageTensorCache(self.directory).get_or_load(self.source, (4, 4), False, self.load(7))
+        cache = ImageTensorCache(self.directory)
+        img = cache.get_or_load(self.source, (4, 4), False, self.load())
+        self.assertEqual(self.loads, 1)
+        np.testing.assert_array_equal(img, np.full((4, 4, 3), 7, dtype=np.uint8))
+
+    def test_disk_usage_counts_overwrites_once(self):
+        cache = ImageTensorCache(self.directory)
+        img = np.zeros((4, 4, 3), dtype=np.uint8)
+        cache.put("first", img)
+        used = cache._disk_used
+        for _ in range(3):
+            cache.put("second", img)
+        self.assertEqual(cache._disk_used, 2 * used)
+
+    def test_disk_eviction(self):
+        img = np.zeros(1000, dtype=np.uint8)
+        cache = ImageTensorCache(self.directory, disk_bytes=5000)
+        for i in range(10):
+            cache.put(i, img)
+        files = [e for e in os.scandir(self.directory) if e.name.endswith(".npy")]
+        self.assertLessEqual(sum(e.stat().st_size for e in files), 5000)
+        self.assertEqual(cache._disk_used, sum(e.stat().st_size for e in files))
+
+    def test_clear(self):
+        cache = ImageTensorCache(self.directory)
+        cache.get_or_load(self.source, (4, 4), False, self.load())
+        cache.clear()
+        self.assertFalse([e for e in os.scandir(self.directory) if e.name.endswith(".npy")])
+        cache.get_or_load(self.source, (4, 4), False, self.load())
+        self.assertEqual(self.loads, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
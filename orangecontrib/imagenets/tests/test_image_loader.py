@@ -0,0 +1,93 @@
+import os
+import struct
+import tempfile
+import unittest
+
+import numpy as np
+import cv2
+
+from orangecontrib.imagenets.util.image_loader import (
+    jpeg_size, decode_flags, load_image, fit_image
+)
+from orangecontrib.imagenets.util.image_writer import write_image
+
+
+def segment(marker, payload):
+    return bytes([0xFF, marker]) + struct.pack(">H", len(payload) + 2) + payload
+
+
+def jpeg_header(width, height):
+    """SOI, an EXIF segment and a Huffman table ahead of the frame header."""
+    return (b"\xFF\xD8"
+            + segment(0xE1, b"Exif\x00\x00" + bytes(100))
+            + segment(0xC4, bytes(20))
+            + segment(0xC0, b"\x08" + struct.pack(">HH", height, width) + b"\x03" + bytes(9))
+            + b"\xFF\xD9")
+
+
+class TestJpegSize(unittest.TestCase):
+    def test_size_after_exif(self):
+        self.assertEqual(jpeg_size(jpeg_header(4000, 3000)), (4000, 3000))
+
+    def test_encoded_jpeg(self):
+        _, buffer = cv2.imencode(".jpg", np.zeros((30, 40, 3), dtype=np.uint8))
+        self.assertEqual(jpeg_size(buffer), (40, 30))
+
+    def test_not_a_jpeg(self):
+        _, buffer = cv2.imencode(".png", np.zeros((30, 40, 3), dtype=np.uint8))
+        self.assertIsNone(jpeg_size(buffer))
+        self.assertIsNone(jpeg_size(b""))
+
+    def test_decode_flags(self):
+        header = jpeg_header(4000, 3000)
+        self.assertEqual(decode_flags(header, (224, 224)), cv2.IMREAD_REDUCED_COLOR_8)
+        self.assertEqual(decode_flags(header, (512, 512), grayscale=True),
+                         cv2.IMREAD_REDUCED_GRAYSCALE_4)
+        self.assertEqual(decode_flags(header, (3000, 3000)), cv2.IMREAD_COLOR)
+        self.assertEqual(decode_flags(header, None), cv2.IMREAD_COLOR)
+
+
+class TestNpyImages(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.rng = np.random.default_rng(0)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def path(self, name):
+        return os.path.join(self._tmp.name, name)
+
+    def test_round_trip(self):
+        img = self.rng.integers(0, 256, (30, 40, 3), dtype=np.uint8)
+        path = self.path("img.npy")
+        write_image(path, img, fmt="NumPy")
+        np.testing.assert_array_equal(load_image(path, size=None), img)
+        self.assertEqual(load_image(path, size=(20, 10)).shape, (10, 20, 3))
+        self.assertEqual(load_image(path, size=None, grayscale=True).shape, (30, 40))
+
+    def test_single_channel(self):
+        img = self.rng.integers(0, 256, (30, 40, 1), dtype=np.uint8)
+        path = self.path("gray.npy")
+        write_image(path, img, fmt="NumPy")
+        np.testing.assert_array_equal(load_image(path, size=None, grayscale=True), img[:, :, 0])
+        self.assertEqual(load_image(path, size=None).shape, (30, 40, 3))
+
+    def test_unreadable(self):
+        path = self.path("bad.npy")
+        with open(path, "wb") as f:
+            f.write(b"not numpy")
+        self.assertIsNone(load_image(path))
+        self.assertIsNone(load_image(self.path("missing.png")))
+
+
+class TestFitImage(unittest.TestCase):
+    def test_fit(self):
+        img = np.zeros((1000, 500, 3), dtype=np.uint8)
+        self.assertEqual(fit_image(img, 256).shape, (256, 128, 3))
+        small = np.zeros((100, 50, 3), dtype=np.uint8)
+        self.assertIs(fit_image(small, 256), small)
+
+
+if __name__ == "__main__":
+    unittest.main()
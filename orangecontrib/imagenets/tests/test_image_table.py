@@ -0,0 +1,86 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+from orangecontrib.imagenets.util.image_table import join_paths, existing_files, file_signatures
+
+
+class TestJoinPaths(unittest.TestCase):
+    def test_relative_paths_are_joined(self):
+        directory = os.path.join(os.sep, "data")
+        paths = np.array(["a.png", os.path.join("sub", "b.png")])
+        np.testing.assert_array_equal(
+            join_paths(directory, paths),
+            [os.path.join(directory, "a.png"), os.path.join(directory, "sub", "b.png")])
+
+    def test_absolute_paths_are_kept(self):
+        absolute = os.path.join(os.sep, "elsewhere", "c.png")
+        paths = np.array(["a.png", absolute])
+        joined = join_paths(os.path.join(os.sep, "data"), paths)
+        self.assertEqual(joined[1], absolute)
+
+    def test_relative_directory_is_made_absolute(self):
+        joined = join_paths("data", np.array(["a.png"]))
+        self.assertEqual(joined[0], os.path.join(os.path.abspath("data"), "a.png"))
+
+    def test_no_directory(self):
+        paths = np.array(["a.png"])
+        self.assertIs(join_paths(None, paths), paths)
+
+
+class TestExistingFiles(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.tmp = self._tmp.name
+        os.mkdir(os.path.join(self.tmp, "sub"))
+        for name in ("a.png", os.path.join("sub", "b.png"), "Upper.PNG"):
+            open(os.path.join(self.tmp, name), "wb").close()
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_listed_files(self):
+        paths = join_paths(self.tmp, np.array(
+            ["a.png", "missing.png", os.path.join("sub", "b.png"),
+             os.path.join("nodir", "c.png"), "sub"]))
+        np.testing.assert_array_equal(existing_files(paths),
+                                      [True, False, True, False, False])
+
+    def test_empty(self):
+        self.assertEqual(len(existing_files(np.array([], dtype=str))), 0)
+
+    def test_unlisted_names_are_checked_individually(self):
+        # as on a case-insensitive filesystem, where upper.png opens Upper.PNG
+        paths = join_paths(self.tmp, np.array(["a.png", "upper.png"]))
+        upper = os.path.join(self.tmp, "Upper.PNG")
+        with patch("os.path.isfile",
+                   side_effect=lambda p: p.lower() == upper.lower()) as isfile:
+            np.testing.assert_array_equal(existing_files(paths), [True, True])
+        isfile.assert_called_once_with(paths[1])
+
+    def test_signatures(self):
+        paths = join_paths(self.tmp, np.array(
+            ["a.png", "missing.png", os.path.join("sub", "b.png"), "sub", "a.png"]))
+        signatures = file_signatures(paths)
+        for i in (0, 2, 4):
+            st = os.stat(paths[i])
+            self.assertEqual(signatures[i], (st.st_mtime_ns, st.st_size))
+        self.assertIsNone(signatures[1])
+        self.assertIsNone(signatures[3])
+        self.assertEqual(file_signatures(np.array([], dtype=str)), [])
+
+    def test_unlisted_signatures_are_stat_ed(self):
+        upper = os.path.join(self.tmp, "Upper.PNG")
+        paths = join_paths(self.tmp, np.array(["upper.png"]))
+        real_stat = os.stat
+        with patch("os.stat", side_effect=lambda p: real_stat(upper if p == paths[0] else p)):
+            signature, = file_signatures(paths)
+        st = os.stat(upper)
+        self.assertEqual(signature, (st.st_mtime_ns, st.st_size))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import cv2
+
+from orangecontrib.imagenets.util.image_writer import FORMATS, ImageWriter, encode_params, write_image
+
+
+class TestImageWriter(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.images = np.random.default_rng(0).integers(0, 256, (5, 16, 24, 3), dtype=np.uint8)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def path(self, name):
+        return os.path.join(self._tmp.name, name)
+
+    def test_lossless_formats(self):
+        for fmt in ("PNG", "NumPy"):
+            paths = [self.path(f"{fmt}{i}{FORMATS[fmt][0]}") for i in range(len(self.images))]
+            with ImageWriter(fmt, workers=2, max_pending=2) as writer:
+                for path, img in zip(paths, self.images):
+                    writer.submit(path, img)
+            for path, img in zip(paths, self.images):
+                read = np.load(path) if fmt == "NumPy" else cv2.imread(path)
+                np.testing.assert_array_equal(read, img)
+
+    def test_write_errors_are_raised(self):
+        writer = ImageWriter("PNG")
+        writer.submit(self.path(os.path.join("missing", "a.png")), self.images[0])
+        with self.assertRaises(OSError):
+            writer.close()
+
+    def test_levels_are_clipped(self):
+        self.assertEqual(encode_params("PNG", 20), [cv2.IMWRITE_PNG_COMPRESSION, 9])
+        self.assertEqual(encode_params("JPEG", -5), [cv2.IMWRITE_JPEG_QUALITY, 0])
+
+    def test_jpeg(self):
+        path = self.path("a.jpg")
+        write_image(path, self.images[0], "JPEG", 95)
+        self.assertEqual(cv2.imread(path).shape, self.images[0].shape)
+
+
+if __name__ == "__main__":
+    unittest.main()
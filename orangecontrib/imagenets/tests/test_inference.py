@@ -0,0 +1,47 @@
+import unittest
+
+import numpy as np
+
+from orangecontrib.imagenets.util.inference import PIXEL_SCALE, model_input_scale, normalize_batch
+
+
+def layer(name, module="keras.src.layers.core"):
+    return type(name, (), {"__module__": module})()
+
+
+class Model:
+    def __init__(self, *layers):
+        self.layers = list(layers)
+
+
+class TestModelInputScale(unittest.TestCase):
+    PREPROCESSING = "keras.src.layers.preprocessing.rescaling"
+
+    def test_leading_rescaling(self):
+        model = Model(layer("InputLayer"), layer("Rescaling", self.PREPROCESSING), layer("Conv2D"))
+        self.assertEqual(model_input_scale(model), 1.0)
+
+    def test_rescaling_after_other_preprocessing(self):
+        model = Model(layer("Resizing", self.PREPROCESSING), layer("Rescaling", self.PREPROCESSING))
+        self.assertEqual(model_input_scale(model), 1.0)
+
+    def test_rescaling_after_model_layers(self):
+        model = Model(layer("Conv2D"), layer("Rescaling", self.PREPROCESSING))
+        self.assertEqual(model_input_scale(model), PIXEL_SCALE)
+
+    def test_no_layers(self):
+        self.assertEqual(model_input_scale(Model()), PIXEL_SCALE)
+        self.assertEqual(model_input_scale(object()), PIXEL_SCALE)
+
+
+class TestNormalizeBatch(unittest.TestCase):
+    def test_scale(self):
+        images = np.array([[0, 255]], dtype=np.uint8)
+        np.testing.assert_allclose(normalize_batch(images), [[0, 1]])
+        scaled = normalize_batch(images, 1.0)
+        self.assertEqual(scaled.dtype, np.float32)
+        np.testing.assert_array_equal(scaled, [[0, 255]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+
+from orangecontrib.imagenets.util.model_analysis import (
+    DEFAULT_INPUT_SHAPE, analyse_layers, layers_input_shape, totals
+)
+
+
+class TestAnalyseLayers(unittest.TestCase):
+    def test_conv_flatten_dense(self):
+        layers = [
+            {"type": "Conv2D", "filters": 32, "kernel_size": 3},
+            {"type": "Flatten"},
+            {"type": "Dense", "units": 10},
+        ]
+        conv, flatten, dense = analyse_layers(layers, (32, 32, 3))
+        self.assertEqual(conv["output_shape"], (30, 30, 32))
+        self.assertEqual(conv["params"], 896)
+        self.assertEqual(conv["macs"], 30 * 30 * 32 * 3 * 3 * 3)
+        self.assertEqual(conv["activation_bytes"], 30 * 30 * 32 * 4)
+        self.assertEqual(flatten["output_shape"], (28800,))
+        self.assertEqual(dense["output_shape"], (10,))
+        self.assertEqual(dense["params"], 28800 * 10 + 10)
+        self.assertEqual(totals([conv, flatten, dense])["params"], 896 + 288010)
+
+    def test_same_padding_and_pooling(self):
+        layers = [
+            {"type": "Conv2D", "filters": 8, "kernel_size": 3, "strides": 2,
+             "padding": "same", "use_bias": False},
+            {"type": "MaxPooling2D"},
+            {"type": "GlobalAveragePooling2D"},
+        ]
+        conv, pool, gap = analyse_layers(layers, (225, 225, 1))
+        self.assertEqual(conv["output_shape"], (113, 113, 8))
+        self.assertEqual(conv["params"], 3 * 3 * 1 * 8)
+        self.assertEqual(pool["output_shape"], (56, 56, 8))
+        self.assertEqual(gap["output_shape"], (8,))
+
+    def test_stops_at_first_error(self):
+        layers = [
+            {"type": "Flatten"},
+            {"type": "Conv2D", "filters": 8},
+            {"type": "Dense", "units": 10},
+        ]
+        results = analyse_layers(layers, (8, 8, 3))
+        self.assertEqual(len(results), 2)
+        self.assertIn("error", results[1])
+        self.assertEqual(totals(results)["params"], 0)
+
+    def test_empty_output(self):
+        results = analyse_layers([{"type": "Conv2D", "filters": 8, "kernel_size": 5}], (3, 3, 1))
+        self.assertIn("error", results[0])
+
+
+class TestLayersInputShape(unittest.TestCase):
+    def test_declared_shape(self):
+        conv = {"type": "Conv2D", "filters": 8}
+        self.assertEqual(layers_input_shape([dict(conv, input_shape=[64, 48, 1])]), (64, 48, 1))
+        self.assertEqual(layers_input_shape([dict(conv, batch_shape=[None, 32, 32, 3])]), (32, 32, 3))
+        self.assertEqual(layers_input_shape([conv]), DEFAULT_INPUT_SHAPE)
+        self.assertEqual(layers_input_shape([]), DEFAULT_INPUT_SHAPE)
+
+
+if __name__ == "__main__":
+    unittest.main()
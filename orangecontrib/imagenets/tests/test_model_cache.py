@@ -0,0 +1,97 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from orangecontrib.imagenets.util.model_cache import ModelCache, file_signature
+
+
+class Weight:
+    def __init__(self, nbytes):
+        self.nbytes = nbytes
+
+
+class Model:
+    def __init__(self, nbytes):
+        self.weights = [Weight(nbytes)]
+
+    def get_weights(self):
+        return self.weights
+
+
+class TestModelCache(unittest.TestCase):
+    def setUp(self):
+        self.loads = 0
+
+    def load(self, nbytes=10):
+        def load():
+            self.loads += 1
+            return Model(nbytes)
+        return load
+
+    def test_shared_instance(self):
+        cache = ModelCache()
+        model = cache.get_or_load("a", self.load())
+        self.assertIs(cache.get_or_load("a", self.load()), model)
+        self.assertIsNot(cache.get_or_load("b", self.load()), model)
+        self.assertEqual(self.loads, 2)
+
+    def test_least_recently_used_are_dropped(self):
+        cache = ModelCache(max_bytes=25)
+        cache.get_or_load("a", self.load())
+        cache.get_or_load("b", self.load())
+        cache.get_or_load("a", self.load())
+        cache.get_or_load("c", self.load())
+        self.assertEqual(list(cache._models), ["a", "c"])
+        self.assertEqual(cache._used, 20)
+
+    def test_too_large_is_not_kept(self):
+        cache = ModelCache(max_bytes=25)
+        cache.get_or_load("big", self.load(100))
+        cache.get_or_load("big", self.load(100))
+        self.assertEqual(self.loads, 2)
+        self.assertEqual(cache._used, 0)
+
+    def test_concurrent_requests_load_once(self):
+        cache = ModelCache()
+
+        def slow_load():
+            time.sleep(0.05)
+            return self.load()()
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get_or_load("a", slow_load)))
+                   for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.loads, 1)
+        self.assertTrue(all(model is results[0] for model in results))
+
+    def test_clear(self):
+        cache = ModelCache()
+        cache.get_or_load("a", self.load())
+        cache.clear()
+        cache.get_or_load("a", self.load())
+        self.assertEqual(self.loads, 2)
+
+
+class TestFileSignature(unittest.TestCase):
+    def test_signature(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "model.keras")
+            with open(path, "wb") as f:
+                f.write(b"1")
+            signature = file_signature(path)
+            self.assertEqual(signature, file_signature(path))
+            with open(path, "wb") as f:
+                f.write(b"12")
+            self.assertNotEqual(signature, file_signature(path))
+            with self.assertRaises(OSError):
+                file_signature(os.path.join(tmp, "missing.keras"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from orangecontrib.imagenets.util.prediction_cache import PredictionCache, image_key
+
+
+class TestPredictionCache(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self._tmp.name, "predictions.sqlite")
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    @staticmethod
+    def probs(i):
+        return np.full(10, i, dtype=np.float32)  # 40 bytes
+
+    def test_hits_and_misses(self):
+        cache = PredictionCache(self.path)
+        cache.put_many("m", [("a", self.probs(1)), ("b", self.probs(2)), (None, self.probs(3))])
+        found = cache.get_many("m", ["a", "c", None])
+        self.assertEqual(set(found), {"a"})
+        np.testing.assert_array_equal(found["a"], self.probs(1))
+        self.assertEqual(cache.size(), (2, 80))
+
+    def test_models_are_separate(self):
+        cache = PredictionCache(self.path)
+        cache.put_many("m1", [("a", self.probs(1))])
+        cache.put_many("m2", [("a", self.probs(2))])
+        np.testing.assert_array_equal(cache.get_many("m1", ["a"])["a"], self.probs(1))
+        np.testing.assert_array_equal(cache.get_many("m2", ["a"])["a"], self.probs(2))
+        self.assertEqual(cache.get_many("m3", ["a"]), {})
+
+    def test_evicts_least_recently_used(self):
+        cache = PredictionCache(self.path, max_bytes=4000)
+        keys = [f"img{i}" for i in range(100)]
+        cache.put_many("m", [(key, self.probs(i)) for i, key in enumerate(keys)])
+        self.assertEqual(cache.size(), (100, 4000))
+
+        # a re-run in which most images are unchanged: their hits share a timestamp
+        self.assertEqual(len(cache.get_many("m", keys[5:])), 95)
+        cache.put_many("m", [(f"new{i}", self.probs(i)) for i in range(5)])
+        count, nbytes = cache.size()
+        self.assertEqual((count, nbytes), (90, 3600))
+        found = cache.get_many("m", keys + [f"new{i}" for i in range(5)])
+        self.assertFalse(set(keys[:5]) & set(found))
+        self.assertTrue({f"new{i}" for i in range(5)} <= set(found))
+
+    def test_clear(self):
+        cache = PredictionCache(self.path)
+        cache.put_many("m", [("a", self.probs(1))])
+        cache.clear()
+        self.assertEqual(cache.size(), (0, 0))
+
+
+class TestImageKey(unittest.TestCase):
+    def test_key(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "a.png")
+            with open(path, "wb") as f:
+                f.write(b"1")
+            key = image_key(path, (224, 224))
+            self.assertEqual(key, image_key(path, (224, 224)))
+            self.assertNotEqual(key, image_key(path, (128, 128)))
+            with open(path, "wb") as f:
+                f.write(b"12")
+            self.assertNotEqual(key, image_key(path, (224, 224)))
+            self.assertIsNone(image_key(os.path.join(tmp, "missing.png")))
+
+    def test_known_signature(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "a.png")
+            with open(path, "wb") as f:
+                f.write(b"1")
+            st = os.stat(path)
+            self.assertEqual(image_key(path, (224, 224), (st.st_mtime_ns, st.st_size)),
+                             image_key(path, (224, 224)))
+
+
+if __name__ == "__main__":
+    unittest.main()
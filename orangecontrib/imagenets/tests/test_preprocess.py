@@ -0,0 +1,71 @@
+import os
+import tempfile
+import unittest
+
+from orangecontrib.imagenets.util.preprocess import PreprocessManifest
+
+OPTIONS = (False, True, 224, 224, False)
+
+
+class TestPreprocessManifest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.out_dir = os.path.join(self._tmp.name, "out")
+        self.in_path = os.path.join(self._tmp.name, "a.png")
+        self.out_path = os.path.join(self.out_dir, "a.png")
+        self.write(self.in_path, b"source")
+        self.write(self.out_path, b"output")
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    @staticmethod
+    def write(path, content):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(content)
+
+    def test_recorded_output_is_current(self):
+        manifest = PreprocessManifest(self.out_dir, OPTIONS)
+        self.assertFalse(manifest.is_current(self.in_path, self.out_path))
+        manifest.record(self.in_path, self.out_path)
+        self.assertTrue(manifest.is_current(self.in_path, self.out_path))
+
+    def test_saved_and_reloaded(self):
+        manifest = PreprocessManifest(self.out_dir, OPTIONS)
+        manifest.record(self.in_path, self.out_path)
+        manifest.save()
+        self.assertTrue(PreprocessManifest(self.out_dir, OPTIONS).is_current(self.in_path, self.out_path))
+
+    def test_other_options_are_not_current(self):
+        manifest = PreprocessManifest(self.out_dir, OPTIONS)
+        manifest.record(self.in_path, self.out_path)
+        manifest.save()
+        other = PreprocessManifest(self.out_dir, (True,) + OPTIONS[1:])
+        self.assertFalse(other.is_current(self.in_path, self.out_path))
+
+    def test_changed_source_or_missing_output(self):
+        manifest = PreprocessManifest(self.out_dir, OPTIONS)
+        manifest.record(self.in_path, self.out_path)
+        self.write(self.in_path, b"changed source")
+        self.assertFalse(manifest.is_current(self.in_path, self.out_path))
+        manifest.record(self.in_path, self.out_path)
+        os.remove(self.out_path)
+        self.assertFalse(manifest.is_current(self.in_path, self.out_path))
+
+    def test_checkpoint(self):
+        manifest = PreprocessManifest(os.path.join(self._tmp.name, "new"), OPTIONS)
+        manifest.record(self.in_path, self.out_path)
+        manifest.checkpoint()
+        self.assertFalse(os.path.exists(manifest.path))
+        manifest.SAVE_INTERVAL = 0
+        manifest.checkpoint()
+        self.assertTrue(os.path.exists(manifest.path))
+
+    def test_corrupt_manifest_is_ignored(self):
+        self.write(os.path.join(self.out_dir, PreprocessManifest.FILENAME), b"{not json")
+        self.assertEqual(PreprocessManifest(self.out_dir, OPTIONS).entries, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+import numpy as np
+
+from orangecontrib.imagenets.util.lazy_import import lazy_import
+
+cv2 = lazy_import("cv2")
+
+
+class AugmentSpec:
+    """
+    Augmentation options shared by the Augment and Train widgets. Ranges
+    follow the values the Augment widget has always used with Keras'
+    ImageDataGenerator.
+    """
+
+    ZOOM_RANGE = 0.2
+    ROTATION_RANGE = 30
+    SHEAR_RANGE = 0.2
+    BRIGHTNESS_RANGE = (0.7, 1.3)
+    BLUR_SIGMA = 2.0
+    NOISE_SIGMA = 15.0
+
+    FLAGS = ("zoom", "flip", "rotate", "shear", "brightness", "blur", "gaussian_noise")
+
+    def __init__(self, zoom=False, flip=False, rotate=False, shear=False,
+                 brightness=False, blur=False, gaussian_noise=False):
+        self.zoom = zoom
+        self.flip = flip
+        self.rotate = rotate
+        self.shear = shear
+        self.brightness = brightness
+        self.blur = blur
+        self.gaussian_noise = gaussian_noise
+
+    @property
+    def has_geometry(self):
+        return self.zoom or self.flip or self.rotate or self.shear
+
+    def to_dict(self):
+        return {flag: bool(getattr(self, flag)) for flag in self.FLAGS}
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(**{flag: bool(d.get(flag, False)) for flag in cls.FLAGS})
+
+
+def affine_matrices(spec: AugmentSpec, n, height, width, rng):
+    """Draw ``n`` random 2x3 affine matrices about the image centre."""
+    ones, zeros = np.ones(n), np.zeros(n)
+    theta = np.deg2rad(rng.uniform(-spec.ROTATION_RANGE, spec.ROTATION_RANGE, n)) if spec.rotate else zeros
+    # like ImageDataGenerator, the shear range is an angle in degrees
+    shear = np.deg2rad(rng.uniform(-spec.SHEAR_RANGE, spec.SHEAR_RANGE, n)) if spec.shear else zeros
+    if spec.zoom:
+        zx = rng.uniform(1 - spec.ZOOM_RANGE, 1 + spec.ZOOM_RANGE, n)
+        zy = rng.uniform(1 - spec.ZOOM_RANGE, 1 + spec.ZOOM_RANGE, n)
+    else:
+        zx, zy = ones, ones
+    fx = np.where(rng.random(n) < 0.5, -1.0, 1.0) if spec.flip else ones
+
+    cos, sin = np.cos(theta), np.sin(theta)
+    # rotation @ shear @ zoom @ flip, written out element-wise for all n at once
+    a = cos * zx * fx
+    b = (cos * np.tan(shear) - sin) * zy
+    c = sin * zx * fx
+    d = (sin * np.tan(shear) + cos) * zy
+
+    cx, cy = (width - 1) / 2.0, (height - 1) / 2.0
+    M = np.empty((n, 2, 3))
+    M[:, 0, 0], M[:, 0, 1] = a, b
+    M[:, 1, 0], M[:, 1, 1] = c, d
+    M[:, 0, 2] = cx - a * cx - b * cy
+    M[:, 1, 2] = cy - c * cx - d * cy
+    return M
+
+
+def augment_images(images, spec: AugmentSpec, count=1, rng=None):
+    """
+    Produce ``count`` augmented variants of each image in ``images`` (a uint8
+    array of shape (n, h, w[, c]) of equally sized images) in one pass.
+    Returns an array of shape (n * count, h, w[, c]); variants of image ``i``
+    are at ``i * count .. (i + 1) * count - 1``.
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    images = np.asarray(images)
+    out = np.repeat(images, count, axis=0)
+    n, height, width = out.shape[:3]
+
+    if spec.has_geometry:
+        for k, M in enumerate(affine_matrices(spec, n, height, width, rng)):
+            out[k] = cv2.warpAffine(out[k], M, (width, height), borderMode=cv2.BORDER_REPLICATE)
+
+    if spec.blur:
+        for k in range(n):
+            out[k] = cv2.GaussianBlur(out[k], (0, 0), spec.BLUR_SIGMA)
+
+    if spec.brightness or spec.gaussian_noise:
+        arr = out.astype(np.float32)
+        if spec.brightness:
+            factors = rng.uniform(*spec.BRIGHTNESS_RANGE, n).astype(np.float32)
+            arr *= factors.reshape((n,) + (1,) * (arr.ndim - 1))
+        if spec.gaussian_noise:
+            arr += rng.normal(0, spec.NOISE_SIGMA, arr.shape).astype(np.float32)
+        out = np.clip(arr, 0, 255).astype(np.uint8)
+
+    return out
+
+
+def augment_image(img, spec: AugmentSpec, count=1, rng=None):
+    """All ``count`` variants of a single image, shape (count, h, w[, c])."""
+    return augment_images(img[np.newaxis], spec, count, rng)
@@ -0,0 +1,183 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from Orange.misc.environ import cache_dir
+
+from orangecontrib.imagenets.util.profiling import optional_stage
+
+
+class ImageTensorCache:
+    """
+    Two-tier cache of decoded, resized uint8 image tensors.
+
+    Entries are keyed by (absolute path, mtime, size, target shape, colour
+    mode), so an edited source file simply misses. The first tier is an
+    in-memory LRU bounded by ``memory_bytes``; the second is a directory of
+    ``.npy`` files, evicted least recently used first once they exceed
+    ``disk_bytes``. Set ``directory`` to None to keep the cache in memory
+    only.
+    """
+
+    def __init__(self, directory=None, memory_bytes=1 << 30, disk_bytes=10 << 30):
+        self.directory = directory
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self._memory = OrderedDict()
+        self._memory_used = 0
+        self._disk_used = None
+        self._lock = threading.Lock()
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(path, size, grayscale, signature=None):
+        """``signature`` is the file's (mtime_ns, size) if known; otherwise it is stat-ed."""
+        path = os.path.abspath(path)
+        if signature is None:
+            st = os.stat(path)
+            signature = st.st_mtime_ns, st.st_size
+        shape = tuple(size) if size is not None else None
+        return (path, *signature, shape, "gray" if grayscale else "bgr")
+
+    def get(self, key):
+        with self._lock:
+            img = self._memory.get(key)
+            if img is not None:
+                self._memory.move_to_end(key)
+                return img
+        if self.directory is None:
+            return None
+        file = self._disk_path(key)
+        try:
+            # read whole: the tensor moves to the memory tier anyway
+            img = np.load(file)
+            os.utime(file)
+        except (OSError, ValueError):
+            return None
+        self._put_memory(key, img)
+        return img
+
+    def put(self, key, img):
+        self._put_memory(key, img)
+        if self.directory is not None:
+            self._put_disk(key, img)
+
+    def get_or_load(self, path, size, grayscale, load, profiler=None, signature=None):
+        try:
+            with optional_stage(profiler, "stat"):
+                key = self.key(path, size, grayscale, signature)
+        except OSError:
+            return None
+        img = self.get(key)
+        if img is None:
+            img = load()
+            if img is not None:
+                self.put(key, img)
+        return img
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._memory_used = 0
+            if self.directory is not None:
+                for entry in os.scandir(self.directory):
+                    if entry.name.endswith(".npy"):
+                        os.remove(entry.path)
+                self._disk_used = 0
+
+    def _put_memory(self, key, img):
+        if img.nbytes > self.memory_bytes:
+            return
+        with self._lock:
+            old = self._memory.pop(key, None)
+            if old is not None:
+                self._memory_used -= old.nbytes
+            self._memory[key] = img
+            self._memory_used += img.nbytes
+            while self._memory_used > self.memory_bytes:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_used -= evicted.nbytes
+
+    def _disk_path(self, key):
+        digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, digest + ".npy")
+
+    def _put_disk(self, key, img):
+        file = self._disk_path(key)
+        tmp = f"{file}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                np.save(f, img)
+            # another thread may have stored the same key; count only the difference
+            try:
+                replaced = os.path.getsize(file)
+            except OSError:
+                replaced = 0
+            os.replace(tmp, file)
+        except OSError:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            return
+        with self._lock:
+            if self._disk_used is None:
+                self._disk_used = sum(e.stat().st_size for e in os.scandir(self.directory)
+                                      if e.name.endswith(".npy"))
+            else:
+                self._disk_used += os.path.getsize(file) - replaced
+            if self._disk_used > self.disk_bytes:
+                self._evict_disk()
+
+    def _evict_disk(self):
+        entries = [e for e in os.scandir(self.directory) if e.name.endswith(".npy")]
+        entries.sort(key=lambda e: e.stat().st_mtime)
+        used = sum(e.stat().st_size for e in entries)
+        target = int(self.disk_bytes * 0.9)
+        for entry in entries:
+            if used <= target:
+                break
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+                used -= size
+            except OSError:
+                pass
+        self._disk_used = used
+
+
+_memory_cache = None
+_disk_cache = None
+
+
+def disk_cache_directory():
+    return os.path.join(cache_dir(), "imagenets", "tensors")
+
+
+def default_cache(disk_bytes=0):
+    """
+    Process-wide cache shared by all widgets. It is kept in memory unless
+    ``disk_bytes`` is given; decoded tensors are then also written to
+    ``disk_cache_directory()``, up to that many bytes, for later sessions.
+    """
+    global _memory_cache, _disk_cache
+    if not disk_bytes:
+        if _memory_cache is None:
+            _memory_cache = ImageTensorCache()
+        return _memory_cache
+    if _disk_cache is None:
+        _disk_cache = ImageTensorCache(disk_cache_directory(), disk_bytes=disk_bytes)
+    _disk_cache.disk_bytes = disk_bytes
+    return _disk_cache
+
+
+def clear_default_cache():
+    """Empty the process-wide caches, including tensors stored by earlier sessions."""
+    if _memory_cache is not None:
+        _memory_cache.clear()
+    if _disk_cache is not None:
+        _disk_cache.clear()
+    elif os.path.isdir(disk_cache_directory()):
+        ImageTensorCache(disk_cache_directory()).clear()
@@ -0,0 +1,103 @@
+import numpy as np
+from keras.utils import PyDataset
+
+from orangecontrib.imagenets.util.augment import augment_images
+from orangecontrib.imagenets.util.image_loader import load_image
+from orangecontrib.imagenets.util.inference import PIXEL_SCALE, normalize_batch
+
+
+class _ShuffledDataset(PyDataset):
+    def __init__(self, n, targets, batch_size, shuffle, seed, augment, scale, **kwargs):
+        super().__init__(**kwargs)
+        self.n = n
+        self.targets = np.asarray(targets)
+        self.batch_size = max(1, int(batch_size))
+        self.shuffle = shuffle
+        self.augment = augment
+        self.scale = scale
+        self.rng = np.random.default_rng(seed)
+        self.seed = int(self.rng.integers(2 ** 31))
+        self.epoch = 0
+        self.order = np.arange(n)
+        if self.shuffle:
+            self.rng.shuffle(self.order)
+
+    def __len__(self):
+        return (self.n + self.batch_size - 1) // self.batch_size
+
+    def batch_rows(self, idx):
+        return self.order[idx * self.batch_size:(idx + 1) * self.batch_size]
+
+    def finish_batch(self, images, idx):
+        if self.augment is not None:
+            # batches are fetched from several threads; seed each one on its own
+            rng = np.random.default_rng([self.seed, self.epoch, idx])
+            images = augment_images(images, self.augment, 1, rng)
+        return normalize_batch(images, self.scale)
+
+    def on_epoch_end(self):
+        self.epoch += 1
+        if self.shuffle:
+            self.rng.shuffle(self.order)
+
+
+class ImageDataset(_ShuffledDataset):
+    """
+    Keras data source that reads, resizes and normalises images one batch at
+    a time instead of materialising the whole dataset in memory. Sample order
+    is reshuffled at the end of every epoch, and with an ``augment`` spec
+    (see ``augment.AugmentSpec``) every epoch sees fresh random variants.
+
+    Without a ``cache``, resident memory is bounded by
+    ``batch_size * max_queue_size`` images. A ``cache`` (see
+    ``image_cache.ImageTensorCache``) additionally keeps decoded tensors up
+    to its in-memory budget and writes them to its disk tier.
+    Pixels are multiplied by ``scale`` per batch; pass 1 for models that
+    rescale their own input (see ``inference.model_input_scale``).
+    """
+
+    def __init__(self, paths, targets, batch_size=32, size=(224, 224), grayscale=False,
+                 shuffle=True, seed=None, workers=4, max_queue_size=4, cache=None, augment=None,
+                 profiler=None, scale=PIXEL_SCALE):
+        super().__init__(len(paths), targets, batch_size, shuffle, seed, augment, scale,
+                         workers=workers, use_multiprocessing=False, max_queue_size=max_queue_size)
+        self.paths = np.asarray(paths, dtype=object)
+        self.size = size
+        self.grayscale = grayscale
+        self.cache = cache
+        self.profiler = profiler
+
+    def __getitem__(self, idx):
+        rows = self.batch_rows(idx)
+        images = [load_image(self.paths[k], self.size, self.grayscale, self.cache, self.profiler)
+                  for k in rows]
+        keep = [k for k, img in enumerate(images) if img is not None]
+        if not keep:
+            return self.fallback_batch(idx)
+        X = np.stack([images[k] for k in keep])
+        return self.finish_batch(X, idx), self.targets[rows[keep]]
+
+    def fallback_batch(self, idx):
+        """
+        A one-image batch standing in for a batch where nothing could be
+        read; Keras cannot skip a batch once it has counted it.
+        """
+        start = (idx + 1) * self.batch_size
+        for k in np.roll(self.order, -start):
+            img = load_image(self.paths[k], self.size, self.grayscale, self.cache, self.profiler)
+            if img is not None:
+                return self.finish_batch(img[np.newaxis], idx), self.targets[[k]]
+        raise ValueError("None of the images could be read.")
+
+
+class ArrayDataset(_ShuffledDataset):
+    """In-memory counterpart of ``ImageDataset`` over a uint8 image array."""
+
+    def __init__(self, images, targets, batch_size=32, shuffle=True, seed=None, augment=None,
+                 scale=PIXEL_SCALE):
+        super().__init__(len(images), targets, batch_size, shuffle, seed, augment, scale)
+        self.images = images
+
+    def __getitem__(self, idx):
+        rows = self.batch_rows(idx)
+        return self.finish_batch(self.images[rows], idx), self.targets[rows]
@@ -0,0 +1,250 @@
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from orangecontrib.imagenets.util.lazy_import import lazy_import
+from orangecontrib.imagenets.util.profiling import optional_stage
+
+cv2 = lazy_import("cv2")
+
+# JPEG start-of-frame markers; C4 (DHT), C8 (JPG) and CC (DAC) share the range
+_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+PREVIEW_SIDE = 256
+
+
+def jpeg_size(buffer):
+    """(width, height) from a JPEG header, or None if ``buffer`` is not a JPEG."""
+    data = memoryview(buffer)
+    if len(data) < 4 or data[0] != 0xFF or data[1] != 0xD8:
+        return None
+    pos = 2
+    while pos + 9 < len(data):
+        if data[pos] != 0xFF:
+            return None
+        marker = data[pos + 1]
+        if marker == 0xFF:  # fill byte
+            pos += 1
+            continue
+        if marker in _SOF_MARKERS:
+            height = data[pos + 5] << 8 | data[pos + 6]
+            width = data[pos + 7] << 8 | data[pos + 8]
+            return width, height
+        if marker == 0xD8 or 0xD0 <= marker <= 0xD7:  # markers without a payload
+            pos += 2
+            continue
+        pos += 2 + (data[pos + 2] << 8 | data[pos + 3])
+    return None
+
+
+def decode_flags(buffer, size=None, grayscale=False):
+    """
+    ``cv2.imdecode`` flags for ``buffer``. JPEGs much larger than ``size``
+    are decoded at 1/2, 1/4 or 1/8 scale, which libjpeg does in the DCT
+    domain. The largest factor that keeps the shorter side at least as
+    long as the longer side of ``size`` is used, so the final resize only
+    ever shrinks whatever the EXIF orientation.
+    """
+    flags = cv2.IMREAD_GRAYSCALE if grayscale else cv2.IMREAD_COLOR
+    dims = jpeg_size(buffer) if size is not None else None
+    if dims is None:
+        return flags
+    width, height = dims
+    for factor in (8, 4, 2):
+        if min(width, height) // factor >= max(size):
+            name = "GRAYSCALE" if grayscale else "COLOR"
+            return getattr(cv2, f"IMREAD_REDUCED_{name}_{factor}")
+    return flags
+
+
+def is_npy(path):
+    return str(path).lower().endswith(".npy")
+
+
+def read_npy(path, grayscale=False):
+    """
+    Read an image saved with ``np.save`` (the Augment widget's NumPy format)
+    with the channel layout ``cv2.imdecode`` would give. None if unreadable.
+    """
+    try:
+        img = np.load(path, allow_pickle=False)
+    except (OSError, ValueError):
+        return None
+    if img.ndim == 3 and img.shape[2] == 1:
+        img = img[:, :, 0]
+    if img.ndim not in (2, 3):
+        return None
+    img = img.astype(np.uint8, copy=False)
+    if grayscale and img.ndim == 3:
+        img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    elif not grayscale and img.ndim == 2:
+        img = cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+    return img
+
+
+def load_image(path: str, size=(224, 224), grayscale=False, cache=None, profiler=None,
+               signature=None):
+    """
+    Read and resize a single image. Returns None if it cannot be read.
+    With a ``cache`` (see ``image_cache.ImageTensorCache``) decoded tensors
+    are reused across calls, keyed by the file's ``signature`` if given (see
+    ``image_table.file_signatures``); a ``profiler`` (see
+    ``profiling.StageProfiler``) collects the time spent in each stage.
+    """
+    if cache is not None:
+        return cache.get_or_load(path, size, grayscale,
+                                 lambda: load_image(path, size, grayscale, profiler=profiler),
+                                 profiler, signature)
+    if is_npy(path):
+        with optional_stage(profiler, "read"):
+            img = read_npy(path, grayscale)
+        if img is None:
+            return None
+        if size is not None:
+            with optional_stage(profiler, "resize"):
+                img = cv2.resize(img, size)
+        return img
+    with optional_stage(profiler, "read"):
+        # no separate existence check: callers resolve paths in bulk (see image_table)
+        try:
+            buffer = np.fromfile(path, dtype=np.uint8)
+        except OSError:
+            return None
+    with optional_stage(profiler, "decode"):
+        img = cv2.imdecode(buffer, decode_flags(buffer, size, grayscale))
+    if img is None:
+        return None
+    if size is not None:
+        with optional_stage(profiler, "resize"):
+            img = cv2.resize(img, size)
+    return img
+
+
+def fit_image(img, max_side=PREVIEW_SIDE):
+    """Shrink ``img`` so that its longer side is at most ``max_side``."""
+    scale = min(1.0, max_side / max(img.shape[:2]))
+    if scale == 1:
+        return img
+    return cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+
+def load_preview(path: str, max_side=PREVIEW_SIDE, grayscale=False, cache=None):
+    """
+    Read an image for display, shrunk to fit ``max_side`` with its aspect
+    ratio kept. JPEGs are decoded at reduced scale. With a ``cache`` the
+    displayed image is stored, not the full-resolution decode, under a key
+    that cannot collide with the fixed-size tensors of ``load_image``.
+    Returns None if it cannot be read.
+    """
+    if cache is not None:
+        return cache.get_or_load(path, ("preview", max_side), grayscale,
+                                 lambda: load_preview(path, max_side, grayscale))
+    if is_npy(path):
+        img = read_npy(path, grayscale)
+    else:
+        try:
+            buffer = np.fromfile(path, dtype=np.uint8)
+        except OSError:
+            return None
+        img = cv2.imdecode(buffer, decode_flags(buffer, (max_side, max_side), grayscale))
+    if img is None:
+        return None
+    return fit_image(img, max_side)
+
+
+class ImageBatchLoader:
+    """
+    Decode and resize images on a bounded thread pool and hand out ready
+    batches through a bounded queue, so that disk I/O and decoding overlap
+    with whatever the consumer does with the previous batch.
+
+    Iterating yields ``(indices, images)`` tuples where ``indices`` are the
+    positions in ``paths`` that were loaded and ``images`` is a uint8 array
+    stacked in the same order. Unreadable or missing images are left out.
+    ``signatures`` of the files, aligned with ``paths``, spare the ``cache``
+    a stat per image.
+    """
+
+    _DONE = object()
+
+    def __init__(self, paths, batch_size=32, size=(224, 224), grayscale=False,
+                 workers=None, prefetch=2, cache=None, profiler=None, signatures=None):
+        self.paths = list(paths)
+        self.signatures = list(signatures) if signatures is not None else [None] * len(self.paths)
+        self.batch_size = max(1, int(batch_size))
+        self.size = size
+        self.grayscale = grayscale
+        self.workers = workers or min(8, os.cpu_count() or 1)
+        self.prefetch = max(1, int(prefetch))
+        self.cache = cache
+        self.profiler = profiler
+        self._queue = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __len__(self):
+        return (len(self.paths) + self.batch_size - 1) // self.batch_size
+
+    def __iter__(self):
+        self._stop.clear()
+        self._queue = queue.Queue(maxsize=self.prefetch)
+        self._thread = threading.Thread(target=self._produce, daemon=True)
+        self._thread.start()
+        try:
+            while True:
+                with optional_stage(self.profiler, "wait"):
+                    item = self._queue.get()
+                if item is self._DONE:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            self.close()
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            # unblock the producer if it is waiting on a full queue
+            while self._thread.is_alive():
+                try:
+                    self._queue.get(timeout=0.05)
+                except queue.Empty:
+                    pass
+            self._thread = None
+
+    def _put(self, item):
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _load(self, index):
+        return load_image(self.paths[index], self.size, self.grayscale, self.cache, self.profiler,
+                          self.signatures[index])
+
+    def _produce(self):
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                for start in range(0, len(self.paths), self.batch_size):
+                    if self._stop.is_set():
+                        return
+                    chunk = range(start, min(start + self.batch_size, len(self.paths)))
+                    images = list(pool.map(self._load, chunk))
+                    indices = [start + k for k, img in enumerate(images) if img is not None]
+                    images = [img for img in images if img is not None]
+                    if images:
+                        batch = (np.array(indices), np.stack(images))
+                    else:
+                        batch = (np.array(indices, dtype=int), None)
+                    if not self._put(batch):
+                        return
+            self._put(self._DONE)
+        except BaseException as e:
+            self._put(e)
@@ -1,5 +1,11 @@
+import os
+import stat
+
+import numpy as np
 from Orange.data import Table
 
+from orangecontrib.imagenets.util.profiling import optional_stage
+
 def image_table_variables(data: Table) -> [str, int]:
     domain = data.domain
     image_col = None
@@ -13,3 +19,116 @@ def image_table_variables(data: Table) -> [str, int]:
         raise Exception("No variable with type \"image\"")
     image_col_index = domain.metas.index(image_col)
     return origin, image_col_index
+
+def image_relative_paths(data: Table, image_col_index=None) -> np.ndarray:
+    """The image column as a string array, paths as stored in the table."""
+    if image_col_index is None:
+        _, image_col_index = image_table_variables(data)
+    paths = data.metas[:, image_col_index].astype(str)
+    if os.altsep:
+        paths = np.char.replace(paths, os.altsep, os.sep)
+    return paths
+
+def join_paths(directory, paths: np.ndarray) -> np.ndarray:
+    """``os.path.join(directory, p)`` for every p, keeping absolute paths as they are."""
+    if not directory:
+        return paths
+    prefix = os.path.join(os.path.abspath(directory), "")
+    absolute = np.char.startswith(paths, os.sep)
+    if os.name == "nt":
+        absolute |= np.char.find(paths, ":") == 1
+    return np.where(absolute, paths, np.char.add(prefix, paths))
+
+def existing_files(paths: np.ndarray, profiler=None) -> np.ndarray:
+    """
+    Boolean mask of the ``paths`` that are existing files. Each distinct
+    directory is listed once with ``os.scandir`` instead of stat-ing every
+    file, which matters on network filesystems. Names missing from a listing
+    are confirmed individually, so case-insensitive filesystems still match.
+    The listing is timed as the ``profiler``'s "stat" stage.
+    """
+    with optional_stage(profiler, "stat"):
+        return _existing_files(paths)
+
+def _by_directory(paths):
+    """(directory, rows, file names) for each distinct directory in ``paths``."""
+    parts = np.char.rpartition(paths, os.sep)
+    dirs, names = parts[:, 0], parts[:, 2]
+    unique_dirs, inverse = np.unique(dirs, return_inverse=True)
+    order = np.argsort(inverse, kind="stable")
+    groups = np.split(order, np.cumsum(np.bincount(inverse))[:-1])
+    for directory, rows in zip(unique_dirs, groups):
+        yield directory, rows, names[rows]
+
+def _existing_files(paths):
+    paths = np.asarray(paths, dtype=str)
+    exists = np.zeros(len(paths), dtype=bool)
+    if not len(paths):
+        return exists
+    for directory, rows, names in _by_directory(paths):
+        try:
+            with os.scandir(directory or os.curdir) as it:
+                listed = [entry.name for entry in it if entry.is_file()]
+        except OSError:
+            continue
+        exists[rows] = np.isin(names, listed)
+        for row in rows[~exists[rows]]:
+            exists[row] = os.path.isfile(paths[row])
+    return exists
+
+def file_signatures(paths, profiler=None) -> list:
+    """
+    ``(mtime_ns, size)`` for each of ``paths`` that is an existing file and
+    None for the others, listing each directory once like ``existing_files``.
+    The image and prediction caches key entries by these, so passing them on
+    saves a second ``os.stat`` per image and cache.
+    """
+    with optional_stage(profiler, "stat"):
+        return _file_signatures(paths)
+
+def _file_signatures(paths):
+    paths = np.asarray(paths, dtype=str)
+    signatures = [None] * len(paths)
+    if not len(paths):
+        return signatures
+    for directory, rows, names in _by_directory(paths):
+        wanted = {}
+        for row, name in zip(rows, names):
+            wanted.setdefault(name, []).append(row)
+        try:
+            with os.scandir(directory or os.curdir) as it:
+                for entry in it:
+                    found = wanted.pop(entry.name, None)
+                    if found and entry.is_file():
+                        st = entry.stat()
+                        for row in found:
+                            signatures[row] = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            continue
+        # names missing from the listing, e.g. in another case on a case-insensitive filesystem
+        for row in (row for found in wanted.values() for row in found):
+            try:
+                st = os.stat(paths[row])
+            except OSError:
+                continue
+            if stat.S_ISREG(st.st_mode):
+                signatures[row] = (st.st_mtime_ns, st.st_size)
+    return signatures
+
+def resolve_image_paths(data: Table, profiler=None) -> (np.ndarray, np.ndarray):
+    """
+    Absolute paths of all images in ``data`` and a mask of those that exist,
+    both aligned with the rows of ``data``.
+    """
+    origin, image_col_index = image_table_variables(data)
+    paths = join_paths(origin, image_relative_paths(data, image_col_index))
+    return paths, existing_files(paths, profiler)
+
+def resolve_image_files(data: Table, profiler=None) -> (np.ndarray, list):
+    """
+    Like ``resolve_image_paths``, but with the ``file_signatures`` of the
+    images (None where missing) instead of a mask.
+    """
+    origin, image_col_index = image_table_variables(data)
+    paths = join_paths(origin, image_relative_paths(data, image_col_index))
+    return paths, file_signatures(paths, profiler)
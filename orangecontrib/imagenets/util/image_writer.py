@@ -0,0 +1,89 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from orangecontrib.imagenets.util.lazy_import import lazy_import
+from orangecontrib.imagenets.util.profiling import optional_stage
+
+cv2 = lazy_import("cv2")
+
+# format name -> (file extension, level range, default level)
+FORMATS = {
+    "PNG": (".png", (0, 9), 1),
+    "JPEG": (".jpg", (0, 100), 95),
+    "WebP": (".webp", (1, 100), 90),
+    "NumPy": (".npy", (0, 0), 0),
+}
+
+
+def encode_params(fmt, level):
+    low, high = FORMATS[fmt][1]
+    level = int(min(max(level, low), high))
+    if fmt == "PNG":
+        return [cv2.IMWRITE_PNG_COMPRESSION, level]
+    if fmt == "JPEG":
+        return [cv2.IMWRITE_JPEG_QUALITY, level]
+    if fmt == "WebP":
+        return [cv2.IMWRITE_WEBP_QUALITY, level]
+    return []
+
+
+def write_image(path, img, fmt="PNG", level=None, profiler=None):
+    if level is None:
+        level = FORMATS[fmt][2]
+    if fmt == "NumPy":
+        with optional_stage(profiler, "write"):
+            np.save(path, img)
+        return
+    with optional_stage(profiler, "encode"):
+        ok, encoded = cv2.imencode(FORMATS[fmt][0], img, encode_params(fmt, level))
+    if not ok:
+        raise OSError(f"Could not encode {path}")
+    with optional_stage(profiler, "write"):
+        encoded.tofile(path)
+
+
+class ImageWriter:
+    """
+    Encode and write images on a thread pool. At most ``max_pending`` images
+    are held in memory waiting to be written; ``submit`` blocks beyond that.
+    The first write error is re-raised from ``submit`` or ``close``.
+    """
+
+    def __init__(self, fmt="PNG", level=None, workers=None, max_pending=64, profiler=None):
+        self.fmt = fmt
+        self.profiler = profiler
+        self.level = FORMATS[fmt][2] if level is None else level
+        self.extension = FORMATS[fmt][0]
+        self._pool = ThreadPoolExecutor(max_workers=workers or min(8, os.cpu_count() or 1))
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._error = None
+
+    def submit(self, path, img):
+        self._raise_error()
+        self._slots.acquire()
+        self._pool.submit(self._write, path, img)
+
+    def _write(self, path, img):
+        try:
+            write_image(path, img, self.fmt, self.level, self.profiler)
+        except Exception as e:
+            self._error = self._error or e
+        finally:
+            self._slots.release()
+
+    def _raise_error(self):
+        if self._error is not None:
+            raise self._error
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+        self._raise_error()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,235 @@
+"""
+Inference backends: a common batched ``predict`` over Keras models, TFLite
+flatbuffers and ONNX models, so Classify can score with whichever runtime
+a model was exported to.
+"""
+import os
+import hashlib
+import threading
+
+import numpy as np
+
+from orangecontrib.imagenets.util.lazy_import import lazy_import
+from orangecontrib.imagenets.util.prediction_cache import model_fingerprint
+
+tf = lazy_import("tensorflow")
+ort = lazy_import("onnxruntime")
+
+BACKEND_EXTENSIONS = {".tflite": "tflite", ".onnx": "onnx"}
+
+PIXEL_SCALE = 1 / 255.0
+
+
+def model_input_scale(model):
+    """
+    Factor that uint8 pixels are multiplied by before they reach a Keras
+    ``model``: 1 if the model starts with its own Rescaling layer (as Build
+    ImageNet's default does), otherwise 1/255.
+    """
+    for layer in getattr(model, "layers", ()):
+        layer_type = type(layer).__name__
+        if layer_type == "InputLayer":
+            continue
+        if layer_type == "Rescaling":
+            return 1.0
+        if "preprocessing" not in type(layer).__module__:
+            break
+    return PIXEL_SCALE
+
+
+def configure_tf_threads(intra_op=0, inter_op=0):
+    """
+    Set TensorFlow's thread pool sizes (0 keeps its default). Returns False
+    if the runtime has already started, after which they cannot change.
+    """
+    try:
+        if intra_op:
+            tf.config.threading.set_intra_op_parallelism_threads(intra_op)
+        if inter_op:
+            tf.config.threading.set_inter_op_parallelism_threads(inter_op)
+    except RuntimeError:
+        return False
+    return True
+
+
+def normalize_batch(images, scale=PIXEL_SCALE):
+    """float32 copy of a uint8 batch, scaled once for the whole batch."""
+    images = images.astype(np.float32)
+    if scale != 1:
+        images *= np.float32(scale)
+    return images
+
+
+class InferenceBackend:
+    """
+    A loaded model that maps a float32 NHWC batch to class probabilities.
+    uint8 pixels are multiplied by ``input_scale`` before ``predict``.
+
+    ``threads`` of 0 leaves the runtime's own default; ``threads_applied``
+    is False if the runtime could not honour it. ``input_shape`` follows
+    Keras and includes the batch dimension as None.
+    """
+
+    name = ""
+    threads_applied = True
+
+    def __init__(self, threads=0):
+        self.threads = threads
+        self._lock = threading.Lock()
+
+    def set_threads(self, threads):
+        with self._lock:
+            if threads != self.threads:
+                self.threads = threads
+                self._reset()
+
+    def _reset(self):
+        pass
+
+    @property
+    def input_shape(self):
+        raise NotImplementedError
+
+    @property
+    def input_scale(self):
+        # exported models carry no layer information; Save ImageNet's TFLite
+        # export folds any leading Rescaling into the graph so they take [0, 1]
+        return PIXEL_SCALE
+
+    def predict(self, images):
+        with self._lock:
+            return self._predict(np.ascontiguousarray(images, dtype=np.float32))
+
+    def _predict(self, images):
+        raise NotImplementedError
+
+    def fingerprint(self):
+        raise NotImplementedError
+
+
+class KerasBackend(InferenceBackend):
+    name = "Keras"
+
+    def __init__(self, model, threads=0):
+        super().__init__(threads)
+        self.model = model
+        self._reset()
+
+    def _reset(self):
+        # TensorFlow's pools are process-wide and fixed once it has started,
+        # which it usually has by the time a model exists
+        self.threads_applied = configure_tf_threads(self.threads) if self.threads else True
+
+    @property
+    def input_shape(self):
+        return self.model.input_shape
+
+    @property
+    def input_scale(self):
+        return model_input_scale(self.model)
+
+    def _predict(self, images):
+        return self.model.predict(images, batch_size=len(images), verbose=0)
+
+    def fingerprint(self):
+        return model_fingerprint(self.model)
+
+
+class _FileBackend(InferenceBackend):
+    def __init__(self, path, threads=0):
+        super().__init__(threads)
+        self.path = path
+        self._fingerprint = None
+        self._reset()
+
+    def fingerprint(self):
+        if self._fingerprint is None:
+            h = hashlib.sha1()
+            with open(self.path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    h.update(chunk)
+            self._fingerprint = h.hexdigest()
+        return self._fingerprint
+
+
+class TFLiteBackend(_FileBackend):
+    name = "TFLite"
+
+    def _reset(self):
+        self.interpreter = tf.lite.Interpreter(model_path=self.path,
+                                               num_threads=self.threads or None)
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+        self._batch = self._input["shape"][0]
+
+    @property
+    def input_shape(self):
+        return (None,) + tuple(int(d) for d in self._input["shape"][1:])
+
+    def _predict(self, images):
+        if len(images) != self._batch:
+            self.interpreter.resize_tensor_input(self._input["index"], images.shape)
+            self.interpreter.allocate_tensors()
+            self._input = self.interpreter.get_input_details()[0]
+            self._output = self.interpreter.get_output_details()[0]
+            self._batch = len(images)
+        x = images
+        if self._input["dtype"] != np.float32:
+            scale, zero_point = self._input["quantization"]
+            info = np.iinfo(self._input["dtype"])
+            x = np.clip(np.round(images / scale + zero_point), info.min, info.max)
+            x = x.astype(self._input["dtype"])
+        self.interpreter.set_tensor(self._input["index"], x)
+        self.interpreter.invoke()
+        out = self.interpreter.get_tensor(self._output["index"])
+        if self._output["dtype"] != np.float32:
+            scale, zero_point = self._output["quantization"]
+            out = (out.astype(np.float32) - zero_point) * scale
+        return out
+
+
+class OnnxBackend(_FileBackend):
+    name = "ONNX Runtime"
+
+    def _reset(self):
+        options = ort.SessionOptions()
+        if self.threads:
+            options.intra_op_num_threads = self.threads
+            options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(self.path, sess_options=options,
+                                            providers=["CPUExecutionProvider"])
+        self._input = self.session.get_inputs()[0]
+        shape = self._input.shape
+        # exports from PyTorch are channels-first; images here are always NHWC
+        self._channels_first = (len(shape) == 4 and shape[1] in (1, 3)
+                                and shape[3] not in (1, 3))
+
+    @property
+    def input_shape(self):
+        shape = [d if isinstance(d, int) else None for d in self._input.shape[1:]]
+        if self._channels_first:
+            shape = shape[1:] + shape[:1]
+        return (None,) + tuple(shape)
+
+    def _predict(self, images):
+        if self._channels_first:
+            images = np.ascontiguousarray(images.transpose(0, 3, 1, 2))
+        return self.session.run(None, {self._input.name: images})[0]
+
+
+def as_backend(model, threads=0):
+    """Wrap a Keras model in a backend; backends are passed through."""
+    if isinstance(model, InferenceBackend):
+        model.set_threads(threads)
+        return model
+    return KerasBackend(model, threads)
+
+
+def load_backend(path, threads=0):
+    kind = BACKEND_EXTENSIONS.get(os.path.splitext(path)[1].lower())
+    if kind == "tflite":
+        return TFLiteBackend(path, threads)
+    if kind == "onnx":
+        return OnnxBackend(path, threads)
+    raise ValueError(f"No inference backend for {os.path.basename(path)}")
@@ -0,0 +1,31 @@
+import time
+
+from keras.callbacks import Callback
+
+
+class KerasCallback(Callback):
+    def __init__(self, worker):
+        super().__init__()
+        self.worker = worker
+        self._batch_start = None
+        self._epoch_start = None
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self._epoch_start = time.perf_counter()
+
+    def on_train_batch_begin(self, batch, logs=None):
+        self._batch_start = time.perf_counter()
+
+    def on_train_batch_end(self, batch, logs=None):
+        self.worker.profiler.batch(time.perf_counter() - self._batch_start)
+        if getattr(self.worker, "stop_requested", False):
+            self.model.stop_training = True
+
+    def on_epoch_end(self, epoch, logs=None):
+        logs = logs or {}
+        self.worker.epoch_end.emit(epoch, {
+            'loss': float(logs.get('loss', 0)),
+            'accuracy': float(logs.get('accuracy', 0)),
+            'time': time.perf_counter() - self._epoch_start,
+        })
+        self.worker.progress.emit(int(100 * (epoch + 1) / self.worker.epochs))
@@ -0,0 +1,64 @@
+"""
+Deferred imports of heavy dependencies (TensorFlow/Keras, OpenCV, scikit-learn).
+
+Orange imports every widget module during widget discovery, so anything
+imported at module level is paid for on every canvas start. Modules wrapped
+with ``lazy_import`` are only imported on first attribute access, and
+``preload`` can warm them up on a background thread once a widget that will
+need them is placed on the canvas.
+"""
+import os
+import importlib
+import threading
+
+# set to "0" to disable warming up heavy modules in the background
+PRELOAD_ENV = "ORANGE_IMAGENETS_PRELOAD"
+
+
+class LazyModule:
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+def lazy_import(name) -> LazyModule:
+    return LazyModule(name)
+
+
+_preloaded = set()
+_preload_lock = threading.Lock()
+
+
+def preload(*names):
+    """Import modules on a daemon thread, once per process."""
+    if os.environ.get(PRELOAD_ENV, "1") == "0":
+        return None
+    with _preload_lock:
+        names = [name for name in names if name not in _preloaded]
+        _preloaded.update(names)
+    if not names:
+        return None
+
+    def run():
+        for name in names:
+            try:
+                importlib.import_module(name)
+            except Exception:
+                # the failure will surface again, with context, on first real use
+                pass
+
+    thread = threading.Thread(target=run, name="imagenets-preload", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,171 @@
+"""
+Static analysis of Build ImageNet layer configs (the ``model_layers`` dicts)
+without instantiating Keras: per-layer output shape, parameter count,
+activation memory and multiply-accumulate count.
+"""
+import math
+
+DEFAULT_INPUT_SHAPE = (224, 224, 3)
+BYTES_PER_VALUE = 4  # float32 activations
+
+
+class LayerAnalysisError(ValueError):
+    pass
+
+
+def _pair(value, name):
+    if isinstance(value, int):
+        return value, value
+    if isinstance(value, (list, tuple)) and len(value) == 2:
+        return int(value[0]), int(value[1])
+    raise LayerAnalysisError(f"Unsupported {name}: {value!r}")
+
+
+def _prod(shape):
+    return math.prod(shape)
+
+
+def _spatial(shape, layer_type):
+    if len(shape) != 3:
+        raise LayerAnalysisError(f"{layer_type} expects a (height, width, channels) input, got {shape}")
+    return shape
+
+
+def _window_out(size, kernel, stride, padding):
+    if padding == "same":
+        return math.ceil(size / stride)
+    if padding == "valid":
+        return (size - kernel) // stride + 1
+    raise LayerAnalysisError(f"Unsupported padding: {padding!r}")
+
+
+def _conv2d(cfg, shape):
+    h, w, c = _spatial(shape, "Conv2D")
+    kh, kw = _pair(cfg.get("kernel_size", 3), "kernel_size")
+    sh, sw = _pair(cfg.get("strides", 1), "strides")
+    padding = cfg.get("padding", "valid")
+    filters = int(cfg["filters"])
+    out = (_window_out(h, kh, sh, padding), _window_out(w, kw, sw, padding), filters)
+    params = kh * kw * c * filters + (filters if cfg.get("use_bias", True) else 0)
+    macs = out[0] * out[1] * filters * kh * kw * c
+    return out, params, macs
+
+
+def _pooling2d(cfg, shape, layer_type):
+    h, w, c = _spatial(shape, layer_type)
+    ph, pw = _pair(cfg.get("pool_size", 2), "pool_size")
+    sh, sw = _pair(cfg.get("strides") or (ph, pw), "strides")
+    padding = cfg.get("padding", "valid")
+    return (_window_out(h, ph, sh, padding), _window_out(w, pw, sw, padding), c), 0, 0
+
+
+def _zero_padding2d(cfg, shape):
+    h, w, c = _spatial(shape, "ZeroPadding2D")
+    padding = cfg.get("padding", 1)
+    if isinstance(padding, int):
+        top = bottom = left = right = padding
+    elif all(isinstance(p, int) for p in padding):
+        (top, left), (bottom, right) = padding, padding
+    else:
+        (top, bottom), (left, right) = padding
+    return (h + top + bottom, w + left + right, c), 0, 0
+
+
+def _dense(cfg, shape):
+    units = int(cfg["units"])
+    fan_in = shape[-1]
+    params = fan_in * units + (units if cfg.get("use_bias", True) else 0)
+    macs = _prod(shape[:-1]) * fan_in * units
+    return tuple(shape[:-1]) + (units,), params, macs
+
+
+def _analyse_layer(cfg, shape):
+    layer_type = cfg["type"]
+    if layer_type == "Conv2D":
+        return _conv2d(cfg, shape)
+    if layer_type in ("MaxPooling2D", "AveragePooling2D"):
+        return _pooling2d(cfg, shape, layer_type)
+    if layer_type == "ZeroPadding2D":
+        return _zero_padding2d(cfg, shape)
+    if layer_type == "Dense":
+        return _dense(cfg, shape)
+    if layer_type == "Flatten":
+        return (_prod(shape),), 0, 0
+    if layer_type == "GlobalAveragePooling2D":
+        return (_spatial(shape, layer_type)[2],), 0, 0
+    if layer_type == "BatchNormalization":
+        # gamma, beta, moving mean and variance; one scale-and-shift per value
+        return tuple(shape), 4 * shape[-1], _prod(shape)
+    if layer_type == "Rescaling":
+        return tuple(shape), 0, _prod(shape)
+    if layer_type in ("Dropout", "Activation"):
+        return tuple(shape), 0, 0
+    raise LayerAnalysisError(f"Cannot analyse {layer_type} layers")
+
+
+def layers_input_shape(layers):
+    """
+    The input shape declared on the first layer config (``input_shape``, or
+    ``batch_shape`` without the batch dimension), else the default.
+    """
+    first = layers[0] if layers else {}
+    if first.get("input_shape"):
+        return tuple(first["input_shape"])
+    for key in ("batch_shape", "batch_input_shape"):
+        if first.get(key):
+            return tuple(first[key][1:])
+    return DEFAULT_INPUT_SHAPE
+
+
+def analyse_layers(layers, input_shape=DEFAULT_INPUT_SHAPE):
+    """
+    Return one dict per layer with ``output_shape``, ``params``,
+    ``activation_bytes`` and ``macs``. Analysis stops at the first layer
+    that cannot be analysed; that layer's dict has an ``error`` message and
+    the remaining layers are omitted.
+    """
+    shape = tuple(input_shape)
+    results = []
+    for cfg in layers:
+        try:
+            out, params, macs = _analyse_layer(cfg, shape)
+            if any(d <= 0 for d in out):
+                raise LayerAnalysisError(f"Output shape {out} is empty")
+        except (LayerAnalysisError, KeyError, TypeError, ValueError) as e:
+            results.append({"type": cfg.get("type"), "error": str(e)})
+            break
+        results.append({
+            "type": cfg["type"],
+            "output_shape": out,
+            "params": params,
+            "activation_bytes": _prod(out) * BYTES_PER_VALUE,
+            "macs": macs,
+        })
+        shape = out
+    return results
+
+
+def totals(results):
+    ok = [r for r in results if "error" not in r]
+    return {
+        "params": sum(r["params"] for r in ok),
+        "activation_bytes": sum(r["activation_bytes"] for r in ok),
+        "macs": sum(r["macs"] for r in ok),
+    }
+
+
+def human(n, binary=False):
+    base = 1024 if binary else 1000
+    for unit in ("", "K", "M", "G", "T"):
+        if abs(n) < base:
+            return f"{n:.0f}{unit}" if unit == "" else f"{n:.1f}{unit}"
+        n /= base
+    return f"{n:.1f}P"
+
+
+def format_layer(result):
+    if "error" in result:
+        return f"⚠ {result['error']}"
+    shape = "×".join(str(d) for d in result["output_shape"])
+    return (f"out {shape} · params {human(result['params'])} · "
+            f"act {human(result['activation_bytes'], binary=True)}B · MACs {human(result['macs'])}")
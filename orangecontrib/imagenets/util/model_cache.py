@@ -0,0 +1,84 @@
+import os
+import threading
+from collections import OrderedDict
+
+
+def file_signature(*paths):
+    """(path, mtime, size) of every file a model is loaded from."""
+    signature = []
+    for path in paths:
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        signature.append((path, st.st_mtime_ns, st.st_size))
+    return tuple(signature)
+
+
+def model_nbytes(model):
+    try:
+        return sum(w.nbytes for w in model.get_weights())
+    except Exception:
+        return 0
+
+
+class ModelCache:
+    """
+    Process-wide cache of loaded models keyed by the signature of the files
+    they were loaded from, so several widgets pointing at the same file share
+    one instance. Least recently used models are dropped once the total
+    weight size exceeds ``max_bytes``; a model larger than the budget is
+    returned but not kept.
+    """
+
+    def __init__(self, max_bytes=2 << 30):
+        self.max_bytes = max_bytes
+        self._models = OrderedDict()
+        self._used = 0
+        self._lock = threading.Lock()
+        self._loading = {}
+
+    def get_or_load(self, key, load):
+        with self._lock:
+            entry = self._models.get(key)
+            if entry is not None:
+                self._models.move_to_end(key)
+                return entry[0]
+            # concurrent requests for the same file wait for a single load
+            key_lock = self._loading.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with self._lock:
+                entry = self._models.get(key)
+            if entry is not None:
+                return entry[0]
+            model = load()
+            self._put(key, model)
+
+        with self._lock:
+            self._loading.pop(key, None)
+        return model
+
+    def _put(self, key, model):
+        nbytes = model_nbytes(model)
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            self._models[key] = (model, nbytes)
+            self._used += nbytes
+            while self._used > self.max_bytes:
+                _, (_, evicted) = self._models.popitem(last=False)
+                self._used -= evicted
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+            self._used = 0
+
+
+_default_cache = None
+
+
+def default_model_cache():
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ModelCache()
+    return _default_cache
@@ -0,0 +1,90 @@
+"""
+Saving Keras models off the GUI thread, in the formats Save ImageNet offers.
+"""
+import os
+
+import numpy as np
+from PyQt5.QtCore import QThread, pyqtSignal
+
+# format -> (label, file dialog filter, extension)
+SAVE_FORMATS = {
+    "keras": ("Keras (.keras)", "Keras files (*.keras)", ".keras"),
+    "h5": ("Legacy HDF5 (.h5)", "HDF5 files (*.h5)", ".h5"),
+    "weights": ("Weights only (.weights.h5)", "Keras weights (*.weights.h5)", ".weights.h5"),
+    "json": ("Architecture only (.json)", "JSON files (*.json)", ".json"),
+}
+
+
+def with_extension(path, fmt):
+    ext = SAVE_FORMATS[fmt][2]
+    return path if path.endswith(ext) else path + ext
+
+
+def _float16_config(config):
+    """Copy of a model config with every float32 dtype policy set to float16."""
+    if isinstance(config, list):
+        return [_float16_config(c) for c in config]
+    if not isinstance(config, dict):
+        return config
+    out = {}
+    for key, value in config.items():
+        if key == "dtype" and value == "float32":
+            value = "float16"
+        elif key == "dtype" and isinstance(value, dict) and value.get("class_name") == "DTypePolicy":
+            value = dict(value, config=dict(value.get("config", {}), name="float16"))
+        else:
+            value = _float16_config(value)
+        out[key] = value
+    return out
+
+
+def float16_model(model):
+    """
+    Rebuild ``model`` with float16 variables and down-cast its weights,
+    halving the size of the saved file. Non-float weights are kept as they are.
+    """
+    half = type(model).from_config(_float16_config(model.get_config()))
+    if not half.built:
+        half.build(model.input_shape)
+    half.set_weights([w.astype(np.float16) if np.issubdtype(w.dtype, np.floating) else w
+                      for w in model.get_weights()])
+    return half
+
+
+def save_model(model, path, fmt="keras", float16=False, progress=None):
+    if float16 and fmt != "json":
+        model = float16_model(model)
+    if progress:
+        progress(50)
+    if fmt == "json":
+        with open(path, "w") as f:
+            f.write(model.to_json(indent=2))
+    elif fmt == "weights":
+        model.save_weights(path)
+    else:
+        model.save(path)
+    return os.path.getsize(path)
+
+
+class SaveWorker(QThread):
+    progress = pyqtSignal(int)
+    finished = pyqtSignal(str, int)
+    failed = pyqtSignal(str)
+
+    def __init__(self, model, path, fmt="keras", float16=False):
+        super().__init__()
+        self.model = model
+        self.path = path
+        self.fmt = fmt
+        self.float16 = float16
+
+    def run(self):
+        try:
+            self.progress.emit(10)
+            size = save_model(self.model, self.path, self.fmt, self.float16,
+                              progress=self.progress.emit)
+        except Exception as e:
+            self.failed.emit(str(e))
+            return
+        self.progress.emit(100)
+        self.finished.emit(self.path, size)
@@ -0,0 +1,113 @@
+"""
+Measured CPU latency of a Keras model on synthetic input: end-to-end
+latency and throughput at several batch sizes, plus per-layer time
+obtained by running the layers one after another.
+"""
+import time
+
+import numpy as np
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from orangecontrib.imagenets.util.model_analysis import DEFAULT_INPUT_SHAPE
+from orangecontrib.imagenets.util.inference import InferenceBackend
+
+
+def model_input_shape(model):
+    try:
+        shape = model.input_shape
+    except (AttributeError, ValueError):
+        return DEFAULT_INPUT_SHAPE
+    if isinstance(shape, list):
+        shape = shape[0]
+    shape = tuple(shape[1:])
+    return shape if None not in shape else DEFAULT_INPUT_SHAPE
+
+
+def median_latency(fn, x, warmup, repeats):
+    for _ in range(warmup):
+        fn(x)
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        out = fn(x)
+        np.asarray(out)  # make sure the computation has finished
+        times.append(time.perf_counter() - start)
+    return float(np.median(times))
+
+
+def profile_model(model, batch_sizes=(1, 8, 32), warmup=2, repeats=5, input_shape=None,
+                  progress=None):
+    input_shape = tuple(input_shape or model_input_shape(model))
+    rng = np.random.default_rng(0)
+    steps = len(batch_sizes) + 1
+    report = {"input_shape": input_shape, "batches": [], "layers": []}
+
+    def forward(x):
+        if isinstance(model, InferenceBackend):
+            return model.predict(x)
+        return model(x, training=False)
+
+    for i, batch_size in enumerate(batch_sizes):
+        x = rng.random((batch_size,) + input_shape, dtype=np.float32)
+        latency = median_latency(forward, x, warmup, repeats)
+        report["batches"].append({
+            "batch_size": batch_size,
+            "latency": latency,
+            "throughput": batch_size / latency if latency > 0 else float("inf"),
+        })
+        if progress:
+            progress(100 * (i + 1) / steps)
+
+    # per-layer times at the first batch size; only possible for Keras layer chains
+    x = rng.random((batch_sizes[0],) + input_shape, dtype=np.float32)
+    try:
+        if isinstance(model, InferenceBackend):
+            raise ValueError(f"{model.name} models do not expose their layers")
+        for layer in model.layers:
+            def run_layer(inp, layer=layer):
+                return layer(inp, training=False)
+            latency = median_latency(run_layer, x, warmup, repeats)
+            x = run_layer(x)
+            report["layers"].append({"name": layer.name, "type": type(layer).__name__,
+                                     "latency": latency})
+    except Exception as e:
+        report["layers_error"] = str(e)
+    if progress:
+        progress(100)
+    return report
+
+
+def format_report(report):
+    lines = ["Input " + "×".join(str(d) for d in report["input_shape"])]
+    for b in report["batches"]:
+        lines.append(f"batch {b['batch_size']}: {b['latency'] * 1000:.1f} ms, "
+                     f"{b['throughput']:.1f} img/s")
+    if report["layers"]:
+        total = sum(layer["latency"] for layer in report["layers"]) or 1.0
+        lines.append(f"Per layer (batch {report['batches'][0]['batch_size']}):")
+        for layer in report["layers"]:
+            lines.append(f"  {layer['name']} ({layer['type']}): {layer['latency'] * 1000:.2f} ms "
+                         f"({100 * layer['latency'] / total:.0f}%)")
+    if "layers_error" in report:
+        lines.append(f"Per-layer profile unavailable: {report['layers_error']}")
+    return "\n".join(lines)
+
+
+class ModelProfileWorker(QThread):
+    progress = pyqtSignal(int)
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+    def __init__(self, model, batch_sizes=(1, 8, 32)):
+        super().__init__()
+        self.model = model
+        self.batch_sizes = batch_sizes
+
+    def run(self):
+        try:
+            report = profile_model(self.model, self.batch_sizes,
+                                   progress=lambda p: self.progress.emit(int(p)))
+        except Exception as e:
+            self.failed.emit(str(e))
+            return
+        self.finished.emit(report)
@@ -0,0 +1,137 @@
+import os
+import time
+import sqlite3
+import hashlib
+from contextlib import contextmanager
+
+import numpy as np
+from Orange.misc.environ import cache_dir
+
+
+def model_fingerprint(model) -> str:
+    """Hash of a Keras model's architecture and weights."""
+    if hasattr(model, "fingerprint"):
+        # inference backends (see ``inference``) hash the file they were loaded from
+        return model.fingerprint()
+    h = hashlib.sha1()
+    h.update(model.to_json().encode("utf-8"))
+    for w in model.get_weights():
+        h.update(np.ascontiguousarray(w).tobytes())
+    return h.hexdigest()
+
+
+def image_key(path, size=(224, 224), signature=None):
+    """
+    Identify an image file by (path, mtime, size) and the input size it is
+    scored at. ``signature`` is the file's (mtime_ns, size) if already known
+    (see ``image_table.file_signatures``); otherwise the file is stat-ed.
+    """
+    path = os.path.abspath(path)
+    if signature is None:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        signature = st.st_mtime_ns, st.st_size
+    mtime_ns, file_size = signature
+    return f"{path}|{mtime_ns}|{file_size}|{size[0]}x{size[1]}"
+
+
+class PredictionCache:
+    """
+    On-disk store of model outputs keyed by model fingerprint and image key,
+    so that re-scoring mostly unchanged tables only runs the model on the
+    images it has not seen. Least recently used entries are evicted once
+    the stored predictions exceed ``max_bytes``.
+    """
+
+    # sqlite limits the number of host parameters per statement
+    CHUNK = 500
+
+    def __init__(self, path=None, max_bytes=256 << 20):
+        if path is None:
+            path = os.path.join(cache_dir(), "imagenets", "predictions.sqlite")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        with self._connect() as con:
+            con.execute("""CREATE TABLE IF NOT EXISTS predictions (
+                               model TEXT, image TEXT, probs BLOB, nbytes INTEGER, last_used REAL,
+                               PRIMARY KEY (model, image))""")
+            con.execute("CREATE INDEX IF NOT EXISTS last_used_idx ON predictions (last_used)")
+
+    @contextmanager
+    def _connect(self):
+        # a fresh connection per call keeps the cache usable from worker threads
+        con = sqlite3.connect(self.path, timeout=30)
+        try:
+            con.execute("PRAGMA journal_mode=WAL")
+            with con:
+                yield con
+        finally:
+            con.close()
+
+    def get_many(self, model, keys):
+        """Return {key: probabilities} for the keys that are cached."""
+        found = {}
+        keys = [k for k in keys if k is not None]
+        now = time.time()
+        with self._connect() as con:
+            for i in range(0, len(keys), self.CHUNK):
+                chunk = keys[i:i + self.CHUNK]
+                marks = ",".join("?" * len(chunk))
+                rows = con.execute(
+                    f"SELECT image, probs FROM predictions WHERE model = ? AND image IN ({marks})",
+                    [model, *chunk]).fetchall()
+                for image, blob in rows:
+                    found[image] = np.frombuffer(blob, dtype=np.float32)
+                if rows:
+                    con.execute(
+                        f"UPDATE predictions SET last_used = ? WHERE model = ? AND image IN ({marks})",
+                        [now, model, *chunk])
+        return found
+
+    def put_many(self, model, items):
+        """Store (key, probabilities) pairs."""
+        now = time.time()
+        rows = []
+        for key, probs in items:
+            if key is None:
+                continue
+            blob = np.asarray(probs, dtype=np.float32).tobytes()
+            rows.append((model, key, blob, len(blob), now))
+        if not rows:
+            return
+        with self._connect() as con:
+            con.executemany("INSERT OR REPLACE INTO predictions VALUES (?, ?, ?, ?, ?)", rows)
+            self._evict(con)
+
+    def _evict(self, con):
+        total = con.execute("SELECT COALESCE(SUM(nbytes), 0) FROM predictions").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - int(self.max_bytes * 0.9)
+        # a whole batch of hits shares one last_used, so select rows, not a cutoff time
+        rowids = []
+        removed = 0
+        cursor = con.execute("SELECT rowid, nbytes FROM predictions ORDER BY last_used, rowid")
+        for rowid, nbytes in cursor:
+            if removed >= excess:
+                break
+            rowids.append(rowid)
+            removed += nbytes
+        cursor.close()
+        for i in range(0, len(rowids), self.CHUNK):
+            chunk = rowids[i:i + self.CHUNK]
+            marks = ",".join("?" * len(chunk))
+            con.execute(f"DELETE FROM predictions WHERE rowid IN ({marks})", chunk)
+
+    def size(self):
+        with self._connect() as con:
+            return con.execute("SELECT COUNT(*), COALESCE(SUM(nbytes), 0) FROM predictions").fetchone()
+
+    def clear(self):
+        with self._connect() as con:
+            con.execute("DELETE FROM predictions")
+        with self._connect() as con:
+            con.execute("VACUUM")
@@ -0,0 +1,134 @@
+import os
+import json
+import time
+import hashlib
+
+import numpy as np
+
+from orangecontrib.imagenets.util.lazy_import import lazy_import
+from orangecontrib.imagenets.util.profiling import StageProfiler, optional_stage
+from orangecontrib.imagenets.util.image_loader import decode_flags, is_npy, read_npy
+
+cv2 = lazy_import("cv2")
+
+
+def preprocess_array(img, do_grayscale, do_resize, resize_width, resize_height, do_normalize,
+                     profiler=None):
+    if do_grayscale:
+        with optional_stage(profiler, "colour"):
+            img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    if do_resize:
+        with optional_stage(profiler, "resize"):
+            img = cv2.resize(img, (resize_width, resize_height))
+    if do_normalize:
+        with optional_stage(profiler, "normalize"):
+            img = cv2.normalize(img, None, 0, 255, cv2.NORM_MINMAX)
+    return img.astype(np.uint8)
+
+
+def preprocess_file(in_path, out_path, options, profiler=None) -> bool:
+    """Preprocess one image file. ``options`` are the arguments of ``preprocess_array``."""
+    if is_npy(in_path):
+        with optional_stage(profiler, "read"):
+            img = read_npy(in_path)
+        if img is None:
+            return False
+    else:
+        with optional_stage(profiler, "read"):
+            try:
+                buffer = np.fromfile(in_path, dtype=np.uint8)
+            except OSError:
+                return False
+        with optional_stage(profiler, "decode"):
+            _, do_resize, resize_width, resize_height, *_ = options
+            size = (resize_width, resize_height) if do_resize else None
+            img = cv2.imdecode(buffer, decode_flags(buffer, size))
+        if img is None:
+            # corrupt or unsupported file; skip it rather than fail the whole run
+            return False
+    img = preprocess_array(img, *options, profiler=profiler)
+    if not is_npy(out_path):
+        with optional_stage(profiler, "encode"):
+            ok, encoded = cv2.imencode(os.path.splitext(out_path)[1], img)
+        if not ok:
+            return False
+    with optional_stage(profiler, "write"):
+        out_dir = os.path.dirname(out_path)
+        if not os.path.exists(out_dir):
+            os.makedirs(out_dir, exist_ok=True)
+        if is_npy(out_path):
+            np.save(out_path, img)
+        else:
+            encoded.tofile(out_path)
+    return True
+
+
+def init_pool_worker():
+    # one process per core already; OpenCV's own threads would oversubscribe
+    cv2.setNumThreads(1)
+
+
+def preprocess_chunk(jobs, options):
+    """
+    Process a list of (in_path, out_path) pairs; runs in a pool worker.
+    Returns a success flag per job and the stage timings and call counts.
+    """
+    profiler = StageProfiler()
+    written = [preprocess_file(in_path, out_path, options, profiler) for in_path, out_path in jobs]
+    return written, profiler.stages, profiler.calls
+
+
+class PreprocessManifest:
+    """
+    Record of the files written to an output folder, so that re-runs only
+    touch new or changed sources. Each entry stores the source mtime and size
+    together with a hash of the preprocessing options it was produced with.
+    """
+
+    FILENAME = ".imagenets_manifest.json"
+    # seconds between saves from ``checkpoint``
+    SAVE_INTERVAL = 5.0
+
+    def __init__(self, output_dir, options):
+        self.path = os.path.join(output_dir, self.FILENAME)
+        self._saved_at = time.monotonic()
+        self.settings_hash = hashlib.sha1(json.dumps(list(options)).encode("utf-8")).hexdigest()
+        self.entries = {}
+        try:
+            with open(self.path, "r") as f:
+                self.entries = json.load(f).get("entries", {})
+        except (OSError, ValueError):
+            pass
+
+    @staticmethod
+    def signature(in_path):
+        try:
+            st = os.stat(in_path)
+        except OSError:
+            return None
+        return [st.st_mtime_ns, st.st_size]
+
+    def is_current(self, in_path, out_path) -> bool:
+        entry = self.entries.get(out_path)
+        return (entry is not None
+                and entry["settings"] == self.settings_hash
+                and entry["source"] == self.signature(in_path)
+                and os.path.exists(out_path))
+
+    def record(self, in_path, out_path):
+        signature = self.signature(in_path)
+        if signature is not None:
+            self.entries[out_path] = {"source": signature, "settings": self.settings_hash}
+
+    def checkpoint(self):
+        """Save if the last save is ``SAVE_INTERVAL`` old, so a stopped run keeps its progress."""
+        if time.monotonic() - self._saved_at >= self.SAVE_INTERVAL:
+            self.save()
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._saved_at = time.monotonic()
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"entries": self.entries}, f)
+        os.replace(tmp, self.path)
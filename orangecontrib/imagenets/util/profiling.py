@@ -0,0 +1,136 @@
+import os
+import sys
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# when set, every finished run appends one JSON line to this file
+LOG_ENV = "ORANGE_IMAGENETS_PROFILE_LOG"
+
+
+def peak_rss_bytes():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class StageProfiler:
+    """
+    Lightweight, thread-safe timing of pipeline stages (stat, read, decode,
+    resize, colour, inference, encode, write, ...), processed image count and
+    per-batch latency. Workers share one instance across their threads.
+    """
+
+    def __init__(self, name=""):
+        self.name = name
+        self.stages = {}
+        self.calls = {}
+        self.batch_latencies = []
+        self.images = 0
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+        self._end = None
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name, seconds, calls=1):
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+            self.calls[name] = self.calls.get(name, 0) + calls
+
+    def merge(self, stages, calls=None):
+        """Add stage totals collected elsewhere, e.g. in a pool process."""
+        for name, seconds in stages.items():
+            self.add(name, seconds, (calls or {}).get(name, 1))
+
+    def count(self, images=1):
+        with self._lock:
+            self.images += images
+
+    def batch(self, seconds, images=0):
+        with self._lock:
+            self.batch_latencies.append(seconds)
+            self.images += images
+
+    def finish(self):
+        self._end = time.perf_counter()
+        path = os.environ.get(LOG_ENV)
+        if path:
+            with open(path, "a") as f:
+                f.write(json.dumps(self.summary()) + "\n")
+        return self
+
+    @property
+    def elapsed(self):
+        return (self._end or time.perf_counter()) - self._start
+
+    def summary(self):
+        latencies = np.array(self.batch_latencies)
+        p50, p90, p99 = (np.percentile(latencies, [50, 90, 99]).tolist()
+                         if len(latencies) else (None, None, None))
+        elapsed = self.elapsed
+        return {
+            "name": self.name,
+            "elapsed": elapsed,
+            "images": self.images,
+            "images_per_sec": self.images / elapsed if elapsed > 0 else None,
+            "batch_latency_p50": p50,
+            "batch_latency_p90": p90,
+            "batch_latency_p99": p99,
+            "peak_rss_bytes": peak_rss_bytes(),
+            "stages": dict(self.stages),
+            "calls": dict(self.calls),
+        }
+
+    def format_summary(self):
+        s = self.summary()
+        lines = [f"{s['images']} images in {s['elapsed']:.1f} s"]
+        if s["images_per_sec"]:
+            lines[0] += f" ({s['images_per_sec']:.1f} img/s)"
+        if s["batch_latency_p50"] is not None:
+            lines.append("batch p50/p90/p99: " + " / ".join(
+                f"{s[k] * 1000:.0f}" for k in
+                ("batch_latency_p50", "batch_latency_p90", "batch_latency_p99")) + " ms")
+        total = sum(self.stages.values()) or 1.0
+        for name, seconds in sorted(self.stages.items(), key=lambda kv: -kv[1]):
+            lines.append(f"{name}: {seconds:.2f} s ({100 * seconds / total:.0f}%)")
+        if s["peak_rss_bytes"]:
+            lines.append(f"peak RSS: {s['peak_rss_bytes'] / 2 ** 20:.0f} MB")
+        return "\n".join(lines)
+
+    def to_table(self):
+        # imported here so pool worker processes do not pay for Orange
+        from Orange.data import Table, Domain, ContinuousVariable, StringVariable
+        domain = Domain([ContinuousVariable("seconds"), ContinuousVariable("calls")],
+                        metas=[StringVariable("stage")])
+        names = list(self.stages)
+        X = np.array([[self.stages[n], self.calls[n]] for n in names]).reshape(len(names), 2)
+        metas = np.array(names, dtype=object).reshape(-1, 1)
+        table = Table.from_numpy(domain, X, metas=metas)
+        table.name = self.name or "Profile"
+        return table
+
+
+@contextmanager
+def optional_stage(profiler, name):
+    if profiler is None:
+        yield
+    else:
+        with profiler.stage(name):
+            yield
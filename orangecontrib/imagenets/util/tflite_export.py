@@ -0,0 +1,187 @@
+"""
+Export of Keras models to TensorFlow Lite with optional post-training
+quantisation, and a size and CPU latency comparison against the original.
+"""
+import os
+import tempfile
+
+import numpy as np
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from orangecontrib.imagenets.util.lazy_import import lazy_import
+from orangecontrib.imagenets.util.image_loader import load_image
+from orangecontrib.imagenets.util.image_table import resolve_image_paths
+from orangecontrib.imagenets.util.inference import PIXEL_SCALE, model_input_scale, normalize_batch
+from orangecontrib.imagenets.util.model_profile import model_input_shape, median_latency
+
+tf = lazy_import("tensorflow")
+
+QUANTIZATIONS = {
+    "none": "None (float32)",
+    "dynamic": "Dynamic range (int8 weights)",
+    "float16": "Float16 weights",
+    "int8": "Full integer (int8)",
+}
+
+CALIBRATION_SAMPLES = 100
+
+
+def calibration_images(data, input_shape, count=CALIBRATION_SAMPLES, seed=0):
+    """
+    Up to ``count`` images drawn at random from an image Table, scaled to
+    [0, 1] as Classify feeds them to an exported model.
+    """
+    paths, exists = resolve_image_paths(data)
+    rng = np.random.default_rng(seed)
+    paths = rng.permutation(paths[exists])[:count]
+    height, width = input_shape[:2]
+    grayscale = input_shape[-1] == 1
+    images = []
+    for path in paths:
+        img = load_image(path, size=(width, height), grayscale=grayscale)
+        if img is not None:
+            images.append(img.reshape(input_shape))
+    if not images:
+        raise ValueError("None of the calibration images could be read.")
+    return normalize_batch(np.stack(images), PIXEL_SCALE)
+
+
+def convert(model, quantization="none", calibration=None):
+    """
+    Return the TFLite flatbuffer for ``model`` as bytes. ``calibration``
+    images are float32 in [0, 1], the range the exported graph takes.
+    """
+    input_shape = model_input_shape(model)
+    # exported graphs always take pixels in [0, 1] (see ``InferenceBackend.input_scale``);
+    # a model that rescales its own input gets the 0-255 range restored in the graph
+    if model_input_scale(model) == 1:
+        forward = tf.function(lambda x: model(x * 255.0, training=False))
+    else:
+        forward = tf.function(lambda x: model(x, training=False))
+    concrete = forward.get_concrete_function(tf.TensorSpec((None,) + input_shape, tf.float32))
+    converter = tf.lite.TFLiteConverter.from_concrete_functions([concrete], model)
+
+    if quantization != "none":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if quantization == "float16":
+        converter.target_spec.supported_types = [tf.float16]
+    elif quantization == "int8":
+        if calibration is None or not len(calibration):
+            raise ValueError("Full integer quantisation needs calibration images.")
+
+        def representative():
+            for img in calibration:
+                yield [img[np.newaxis]]
+
+        converter.representative_dataset = representative
+        # all ops in int8; inputs and outputs stay float so callers need not quantise
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    return converter.convert()
+
+
+def tflite_latency(content, input_shape, warmup=2, repeats=10):
+    interpreter = tf.lite.Interpreter(model_content=content)
+    interpreter.resize_tensor_input(interpreter.get_input_details()[0]["index"], (1,) + input_shape)
+    interpreter.allocate_tensors()
+    inp = interpreter.get_input_details()[0]["index"]
+    out = interpreter.get_output_details()[0]["index"]
+
+    def run(x):
+        interpreter.set_tensor(inp, x)
+        interpreter.invoke()
+        return interpreter.get_tensor(out)
+
+    x = np.random.default_rng(0).random((1,) + input_shape, dtype=np.float32)
+    return median_latency(run, x, warmup, repeats)
+
+
+def keras_size(model):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "model.keras")
+        model.save(path)
+        return os.path.getsize(path)
+
+
+def export_tflite(model, path, quantization="none", calibration=None, progress=None,
+                  stopped=None):
+    """
+    Write ``model`` to ``path`` as TFLite and return a report comparing file
+    size and batch-1 CPU latency with the Keras model. If ``stopped()`` is
+    true once the file is written, the comparison is skipped and None returned.
+    """
+    input_shape = model_input_shape(model)
+    content = convert(model, quantization, calibration)
+    with open(path, "wb") as f:
+        f.write(content)
+    if stopped is not None and stopped():
+        return None
+    if progress:
+        progress(50)
+
+    x = np.random.default_rng(0).random((1,) + input_shape, dtype=np.float32)
+    report = {
+        "quantization": quantization,
+        "keras_size": keras_size(model),
+        "tflite_size": len(content),
+        "keras_latency": median_latency(lambda x: model(x, training=False), x, 2, 10),
+    }
+    if progress:
+        progress(75)
+    report["tflite_latency"] = tflite_latency(content, input_shape)
+    return report
+
+
+def format_report(report):
+    size_ratio = report["keras_size"] / max(report["tflite_size"], 1)
+    speedup = report["keras_latency"] / max(report["tflite_latency"], 1e-9)
+    mb = 1 << 20
+    return (f"Size: {report['keras_size'] / mb:.1f} MB → {report['tflite_size'] / mb:.1f} MB "
+            f"({size_ratio:.1f}× smaller)\n"
+            f"Latency (batch 1): {report['keras_latency'] * 1000:.1f} ms → "
+            f"{report['tflite_latency'] * 1000:.1f} ms ({speedup:.1f}× faster)")
+
+
+class TFLiteExportWorker(QThread):
+    progress = pyqtSignal(int)
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+    def __init__(self, model, path, quantization="none", calibration_data=None):
+        super().__init__()
+        self.model = model
+        self.path = path
+        self.quantization = quantization
+        self.calibration_data = calibration_data
+        self.stop_requested = False
+
+    def stop(self):
+        """
+        Skip what is left after the step in progress; the conversion itself
+        cannot be interrupted, so a file being written is always completed.
+        """
+        self.stop_requested = True
+
+    def run(self):
+        try:
+            self.progress.emit(5)
+            calibration = None
+            if self.quantization == "int8":
+                if self.calibration_data is None:
+                    raise ValueError("Full integer quantisation needs a Calibration Images input.")
+                calibration = calibration_images(self.calibration_data,
+                                                 model_input_shape(self.model))
+            if self.stop_requested:
+                self.finished.emit(None)
+                return
+            self.progress.emit(20)
+            report = export_tflite(self.model, self.path, self.quantization, calibration,
+                                   progress=self.progress.emit,
+                                   stopped=lambda: self.stop_requested)
+        except Exception as e:
+            self.failed.emit(str(e))
+            return
+        if report is None:
+            self.finished.emit(None)
+            return
+        self.progress.emit(100)
+        self.finished.emit(report)
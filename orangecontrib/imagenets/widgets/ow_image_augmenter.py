@@ -1,15 +1,96 @@
 from Orange.widgets import widget, settings, gui
 from Orange.widgets.widget import Input, Output
 from Orange.data import Table
-from AnyQt.QtWidgets import QFileDialog, QVBoxLayout, QLabel, QSpinBox, QCheckBox, QPushButton, QGroupBox
+from AnyQt.QtWidgets import (
+    QFileDialog, QVBoxLayout, QLabel, QSpinBox, QCheckBox, QPushButton, QGroupBox, QComboBox
+)
 from AnyQt.QtCore import Qt
 from AnyQt.QtGui import QPixmap, QFont
-from PIL import Image, ImageFilter
-from tensorflow.keras.preprocessing.image import ImageDataGenerator, img_to_array, load_img, array_to_img
+from PyQt5.QtCore import QThread, pyqtSignal
 import os
 import uuid
 import numpy as np
 
+from orangecontrib.imagenets.util.lazy_import import lazy_import
+from orangecontrib.imagenets.util.augment import AugmentSpec, augment_image
+from orangecontrib.imagenets.util.image_writer import FORMATS, ImageWriter
+from orangecontrib.imagenets.util.image_loader import load_image, load_preview
+from orangecontrib.imagenets.util.image_cache import default_cache
+from orangecontrib.imagenets.util.image_table import resolve_image_paths
+from orangecontrib.imagenets.util.profiling import StageProfiler
+
+cv2 = lazy_import("cv2")
+
+
+class AugmentWorker(QThread):
+    progress = pyqtSignal(int)
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+    def __init__(self, data, paths, exists, image_col_index, save_folder, spec, augment_count,
+                 output_format="PNG", output_level=None, seed=0):
+        super().__init__()
+        self.data = data
+        self.paths = paths
+        self.exists = exists
+        self.image_col_index = image_col_index
+        self.save_folder = save_folder
+        self.spec = spec
+        self.augment_count = augment_count
+        self.output_format = output_format
+        self.output_level = output_level
+        self.seed = seed
+        self.skipped = 0
+        self.stop_requested = False
+        self.profiler = StageProfiler("Augment")
+
+    def stop(self):
+        """Ask the run to end after the current row; submitted writes are completed."""
+        self.stop_requested = True
+
+    def run(self):
+        new_rows = []
+        new_y = []
+        total = len(self.data)
+
+        try:
+            with ImageWriter(self.output_format, self.output_level, profiler=self.profiler) as writer:
+                for i, row in enumerate(self.data):
+                    if self.stop_requested:
+                        break
+                    img = None
+                    if self.exists[i]:
+                        img = load_image(self.paths[i], size=None, profiler=self.profiler)
+                    if img is None:
+                        self.skipped += 1
+                        continue
+
+                    # seeded per row, so results do not depend on scheduling
+                    rng = np.random.default_rng([self.seed, i])
+                    with self.profiler.stage("augment"):
+                        variants = augment_image(img, self.spec, self.augment_count, rng)
+                    self.profiler.count(len(variants))
+                    for aug_img in variants:
+                        filename = f"aug_{uuid.uuid4().hex}{writer.extension}"
+                        writer.submit(os.path.join(self.save_folder, filename), aug_img)
+                        new_row = list(row.metas)
+                        new_row[self.image_col_index] = filename
+                        new_rows.append(new_row)
+                        new_y.append(row.y)
+                    self.progress.emit(int(100 * (i + 1) / total))
+        except Exception as e:
+            self.failed.emit(str(e))
+            return
+
+        self.profiler.finish()
+        if self.stop_requested:
+            self.finished.emit(None)
+            return
+        metas_array = np.array(new_rows, dtype=object)
+        new_table = Table.from_numpy(self.data.domain, X=np.empty((len(new_rows), 0)),
+                                     Y=np.array(new_y), metas=metas_array)
+        self.finished.emit(new_table)
+
 
 class OWImageAugmenter(widget.OWWidget):
     name = "Augment Images"
@@ -22,6 +103,8 @@ class OWImageAugmenter(widget.OWWidget):
 
     class Outputs:
         augmented_images = Output("Augmented Image Table", Table)
+        augmentation = Output("Augmentation", AugmentSpec, auto_summary=False)
+        profile = Output("Profile", Table)
 
     augment_count = settings.Setting(2)
     save_folder = settings.Setting('/home/chris/Downloads/test')
@@ -32,14 +115,18 @@ class OWImageAugmenter(widget.OWWidget):
     brightness = settings.Setting(False)
     blur = settings.Setting(False)
     gaussian_noise = settings.Setting(False)
-
+    output_format = settings.Setting("PNG")
+    output_level = settings.Setting(1)
+    seed = settings.Setting(0)
 
     def __init__(self):
         super().__init__()
 
         self.image_table = None
+        self.worker = None
         self.layout_controlArea()
         self.layout_mainArea()
+        self.Outputs.augmentation.send(self.augment_spec())
 
     def layout_controlArea(self):
 
@@ -92,9 +179,33 @@ class OWImageAugmenter(widget.OWWidget):
         self.controlArea.layout().addWidget(self.gauss_cb)
 
 
+        self.controlArea.layout().addWidget(QLabel("Output Format:"))
+        self.format_combo = QComboBox()
+        self.format_combo.addItems(FORMATS.keys())
+        self.format_combo.setCurrentText(self.output_format)
+        self.format_combo.currentTextChanged.connect(self.set_output_format)
+        self.controlArea.layout().addWidget(self.format_combo)
+
+        self.controlArea.layout().addWidget(QLabel("Compression Level / Quality:"))
+        self.level_spin = QSpinBox()
+        self.level_spin.valueChanged.connect(lambda val: setattr(self, "output_level", val))
+        self.controlArea.layout().addWidget(self.level_spin)
+        self._update_level_range()
+
+        self.controlArea.layout().addWidget(QLabel("Random Seed:"))
+        self.seed_spin = QSpinBox()
+        self.seed_spin.setRange(0, 2 ** 31 - 1)
+        self.seed_spin.setValue(self.seed)
+        self.seed_spin.setToolTip("Same seed and settings give the same augmented images.")
+        self.seed_spin.valueChanged.connect(lambda val: setattr(self, "seed", val))
+        self.controlArea.layout().addWidget(self.seed_spin)
+
         self.run_button = QPushButton("Generate Augmented Images")
         self.run_button.clicked.connect(self.generate_augmentations)
         self.controlArea.layout().addWidget(self.run_button)
+
+        self.profile_label = QLabel()
+        self.controlArea.layout().addWidget(self.profile_label)
         self.controlArea.layout().setAlignment(Qt.AlignTop)
 
     def layout_mainArea(self):
@@ -138,11 +249,24 @@ class OWImageAugmenter(widget.OWWidget):
             self.save_folder = folder
             self.folder_label.setText(folder)
 
+    def set_output_format(self, fmt):
+        self.output_format = fmt
+        self.output_level = FORMATS[fmt][2]
+        self._update_level_range()
+
+    def _update_level_range(self):
+        low, high = FORMATS[self.output_format][1]
+        level = self.output_level
+        self.level_spin.setRange(low, high)
+        self.level_spin.setEnabled(low != high)
+        self.level_spin.setValue(level)
+
     def set_augment_count(self, val):
         self.augment_count = val
 
     def set_flag(self, attr, val):
         setattr(self, attr, val)
+        self.Outputs.augmentation.send(self.augment_spec())
         self.show_preview()
 
     @Inputs.images
@@ -150,34 +274,31 @@ class OWImageAugmenter(widget.OWWidget):
         self.image_table = table
         self.show_preview()
 
-    def apply_custom_transforms(self, img: Image.Image) -> Image.Image:
-        if self.blur:
-            img = img.filter(ImageFilter.GaussianBlur(radius=2))
-        if self.gaussian_noise:
-            arr = np.array(img).astype(np.float32)
-            noise = np.random.normal(0, 15, arr.shape).astype(np.float32)
-            arr += noise
-            arr = np.clip(arr, 0, 255).astype(np.uint8)
-            img = Image.fromarray(arr)
-        return img
-
+    def augment_spec(self) -> AugmentSpec:
+        return AugmentSpec.from_dict({flag: getattr(self, flag) for flag in AugmentSpec.FLAGS})
 
     def generate_augmentations(self):
         if not self.image_table or not self.save_folder:
             self.error("No image data or folder selected.")
             return
+        self.error()
 
         self.progressBarInit()
         metas = []
         image_col = None
-        origin = None
 
         domain = self.image_table.domain
+        try:
+            # resolved before the origin below is pointed at the save folder
+            paths, exists = resolve_image_paths(self.image_table)
+        except Exception as e:
+            self.error(str(e))
+            self.progressBarFinished()
+            return
 
         for var in domain.metas:
             if var.attributes.get("type") == "image":
                 image_col = var
-                origin = var.attributes.get("origin")
                 var.attributes["origin"] = self.save_folder
             metas.append(var)
 
@@ -186,47 +307,41 @@ class OWImageAugmenter(widget.OWWidget):
             self.progressBarFinished()
             return
 
-        datagen = ImageDataGenerator(
-            zoom_range=0.2 if self.zoom else 0.0,
-            horizontal_flip=self.flip,
-            rotation_range=30 if self.rotate else 0,
-            shear_range=0.2 if self.shear else 0.0,
-            brightness_range=(0.7, 1.3) if self.brightness else None,
-            fill_mode='nearest')
+        self.run_button.setEnabled(False)
+        self.worker = AugmentWorker(
+            self.image_table, paths, exists, domain.metas.index(image_col), self.save_folder,
+            self.augment_spec(), self.augment_count,
+            self.output_format, self.output_level, self.seed
+        )
+        self.worker.progress.connect(self.progressBarSet)
+        self.worker.finished.connect(self.handle_augmented)
+        self.worker.failed.connect(self.handle_failed)
+        self.worker.start()
+
+    def handle_augmented(self, table: Table):
+        if table is None:
+            self.progressBarFinished()
+            self.run_button.setEnabled(True)
+            return
+        self.warning()
+        if self.worker.skipped:
+            self.warning(f"{self.worker.skipped} image(s) could not be loaded and were skipped.")
+        self.Outputs.augmented_images.send(table)
+        self.profile_label.setText(self.worker.profiler.format_summary())
+        self.Outputs.profile.send(self.worker.profiler.to_table())
+        self.progressBarFinished()
+        self.run_button.setEnabled(True)
 
-        new_rows = []
-        new_y = []
-        
-        for i, row in enumerate(self.image_table):
-            path = row.metas[self.image_table.domain.metas.index(image_col)]
-            try:
-                img = load_img(os.path.join(origin,path))
-            except Exception:
-                print("Could not load "+os.path.join(origin,path))
-                continue
-
-            x = img_to_array(img)
-            x = x.reshape((1,) + x.shape)
-
-            gen = datagen.flow(x, batch_size=1)
-
-            for j in range(self.augment_count):
-                batch = next(gen)
-                aug_img = array_to_img(batch[0])
-                aug_img = self.apply_custom_transforms(aug_img)
-                filename = f"aug_{uuid.uuid4().hex}.png"
-                fullpath = os.path.join(self.save_folder, filename)
-                aug_img.save(fullpath)
-                new_row = list(row.metas)
-                new_row[self.image_table.domain.metas.index(image_col)] = filename
-                new_rows.append(new_row)
-                new_y.append(row.y)
-                self.progressBarSet((i * self.augment_count + j) / (len(self.image_table) * self.augment_count) * 100)
-        
-        metas_array = np.array(new_rows, dtype=object)
-        new_table = Table.from_numpy(domain, X=np.empty((len(new_rows), 0)), Y=np.array(new_y), metas=metas_array)
-        self.Outputs.augmented_images.send(new_table)
+    def handle_failed(self, message):
+        self.error(message)
         self.progressBarFinished()
+        self.run_button.setEnabled(True)
+
+    def onDeleteWidget(self):
+        if self.worker is not None:
+            self.worker.stop()
+            self.worker.wait()
+        super().onDeleteWidget()
 
     def show_preview(self):
         if not self.image_table:
@@ -251,34 +366,22 @@ class OWImageAugmenter(widget.OWWidget):
             # Get the first image path
             path = self.image_table[0].metas[domain.metas.index(image_col)]
             full_path = os.path.join(origin, path)
-            image = Image.open(full_path)
-            image.thumbnail((256, 256))
-
-            aug_image = self.augment_image(image)
-            image.save("/tmp/__preview.png")  # Temporary path to convert to pixmap
-            aug_image.save('/tmp/__aug_preview.png')
-            pixmap = QPixmap("/tmp/__preview.png")
-            aug_pixmap = QPixmap("/tmp/__aug_preview.png")
-            self.image_label.setPixmap(pixmap)
-            self.aug_image_label.setPixmap(aug_pixmap)
+            image = load_preview(full_path, cache=default_cache())
+            if image is None:
+                raise ValueError(f"Cannot read {path}")
+
+            aug_image = augment_image(image, self.augment_spec())[0]
+            self.image_label.setPixmap(self.to_pixmap(image))
+            self.aug_image_label.setPixmap(self.to_pixmap(aug_image))
         except Exception as e:
             self.image_label.setText(f"Error loading preview:\n{str(e)}")
 
-    def augment_image(self, image: Image) -> Image:
-        datagen = ImageDataGenerator(
-            zoom_range=0.2 if self.zoom else 0.0,
-            horizontal_flip=self.flip,
-            rotation_range=30 if self.rotate else 0,
-            shear_range=0.2 if self.shear else 0.0,
-            brightness_range=(0.7, 1.3) if self.brightness else None,
-            fill_mode='nearest')
-        x = img_to_array(image)
-        x = x.reshape((1,) + x.shape)
-        gen = datagen.flow(x, batch_size=1)
-        batch = next(gen)
-        aug_img = array_to_img(batch[0])
-        aug_img = self.apply_custom_transforms(aug_img)
-        return aug_img
+    @staticmethod
+    def to_pixmap(img) -> QPixmap:
+        _, buffer = cv2.imencode(".png", img)
+        pixmap = QPixmap()
+        pixmap.loadFromData(buffer, "png")
+        return pixmap
 
 if __name__ == "__main__":
     from Orange.widgets.utils.widgetpreview import WidgetPreview
@@ -1,6 +1,6 @@
 import os
-import numpy as np
-import cv2
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 from AnyQt.QtCore import Qt
 from AnyQt.QtGui import QPixmap, QFont
@@ -12,13 +12,27 @@ from Orange.widgets.widget import OWWidget, Input, Output
 from Orange.widgets.settings import Setting
 from Orange.data import Table, Domain, StringVariable
 
-from orangecontrib.imagenets.util.image_table import image_table_variables
+from orangecontrib.imagenets.util.image_table import (
+    image_table_variables, image_relative_paths, join_paths, existing_files
+)
+from orangecontrib.imagenets.util.image_loader import load_preview
+from orangecontrib.imagenets.util.image_cache import default_cache
+from orangecontrib.imagenets.util.preprocess import (
+    preprocess_array, preprocess_file, preprocess_chunk, init_pool_worker,
+    PreprocessManifest
+)
+from orangecontrib.imagenets.util.profiling import StageProfiler
+from orangecontrib.imagenets.util.lazy_import import lazy_import
+
+cv2 = lazy_import("cv2")
 
 class PreprocessWorker(QThread):
     progress = pyqtSignal(int)
     finished = pyqtSignal(object)
+    failed = pyqtSignal(str)
 
-    def __init__(self, data, output_dir, do_grayscale, do_resize, resize_width, resize_height, do_normalize):
+    def __init__(self, data, output_dir, do_grayscale, do_resize, resize_width, resize_height, do_normalize,
+                 workers=1):
         super().__init__()
         self.data = data
         self.output_dir = output_dir
@@ -27,33 +41,97 @@ class PreprocessWorker(QThread):
         self.resize_width = resize_width
         self.resize_height = resize_height
         self.do_normalize = do_normalize
+        self.workers = max(1, int(workers))
         self.origin, self.image_col_index = image_table_variables(data)
+        self.reused = 0
+        self.processed = 0
+        self.stop_requested = False
+        self.profiler = StageProfiler("Preprocess")
+
+    def stop(self):
+        """Ask the run to end after the files (or pool chunks) already started."""
+        self.stop_requested = True
+
+    def options(self):
+        return (self.do_grayscale, self.do_resize, self.resize_width, self.resize_height, self.do_normalize)
+
+    def jobs(self):
+        """(input, output, output exists) for every row whose input image exists."""
+        rel_paths = image_relative_paths(self.data, self.image_col_index)
+        in_paths = join_paths(self.origin, rel_paths)
+        out_paths = join_paths(self.output_dir, rel_paths)
+        found = existing_files(in_paths, self.profiler)
+        done = existing_files(out_paths[found], self.profiler)
+        return zip(in_paths[found].tolist(), out_paths[found].tolist(), done)
 
     def run(self):
-        total = len(self.data)
-
-        for i, row in enumerate(self.data):
-            img_path = os.path.join(self.origin, row.metas[self.image_col_index])
-            if not os.path.exists(img_path):
-                continue
-            img = cv2.imread(img_path)
-            if self.do_grayscale:
-                img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-            if self.do_resize:
-                img = cv2.resize(img, (self.resize_width, self.resize_height))
-            if self.do_normalize:
-                img = cv2.normalize(img, None, 0, 255, cv2.NORM_MINMAX)
-            img = img.astype(np.uint8)
-            out_path = os.path.join(self.output_dir, row.metas[self.image_col_index])
-            out_dir = os.path.dirname(out_path)
-            if not os.path.exists(out_dir):
-                os.makedirs(out_dir, exist_ok=True)
-            cv2.imwrite(out_path, img)
-            self.progress.emit(int(100 * (i + 1) / total))
+        try:
+            data = self.preprocess()
+        except Exception as e:
+            self.failed.emit(str(e))
+            return
+        self.finished.emit(data)
+
+    def preprocess(self):
+        """The table pointing at the preprocessed images, or None if stopped."""
+        manifest = PreprocessManifest(self.output_dir, self.options())
+        candidates = list(self.jobs())
+        jobs = [(in_path, out_path) for in_path, out_path, done in candidates
+                if not (done and manifest.is_current(in_path, out_path))]
+        self.reused = len(candidates) - len(jobs)
+        self.processed = len(jobs)
+        try:
+            if self.workers > 1:
+                self.run_parallel(jobs, manifest)
+            else:
+                self.run_serial(jobs, manifest)
+        finally:
+            # keep what was written even if the run stopped or failed part way
+            manifest.save()
+        self.profiler.count(self.processed)
+        self.profiler.finish()
+        if self.stop_requested:
+            return None
 
         data = self.data.copy()
         data.domain.metas[self.image_col_index].attributes["origin"] = self.output_dir
-        self.finished.emit(data)
+        return data
+
+    def run_serial(self, jobs, manifest):
+        total = len(jobs)
+        options = self.options()
+        for i, (in_path, out_path) in enumerate(jobs):
+            if self.stop_requested:
+                return
+            if preprocess_file(in_path, out_path, options, self.profiler):
+                manifest.record(in_path, out_path)
+                manifest.checkpoint()
+                self.progress.emit(int(100 * (i + 1) / total))
+
+    def run_parallel(self, jobs, manifest):
+        total = len(jobs)
+        chunk_size = max(1, min(256, total // (self.workers * 4)))
+        chunks = [jobs[i:i + chunk_size] for i in range(0, total, chunk_size)]
+        done = 0
+        # fork from a process with Qt, loader and preload threads running is unsafe
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=context,
+                                 initializer=init_pool_worker) as pool:
+            futures = {pool.submit(preprocess_chunk, chunk, self.options()): chunk for chunk in chunks}
+            for future in as_completed(futures):
+                if self.stop_requested:
+                    for pending in futures:
+                        pending.cancel()
+                    return
+                written, stages, calls = future.result()
+                self.profiler.merge(stages, calls)
+                done += len(written)
+                # only outputs this run wrote; a stale file from older settings must not be recorded
+                for (in_path, out_path), ok in zip(futures[future], written):
+                    if ok:
+                        manifest.record(in_path, out_path)
+                manifest.checkpoint()
+                self.progress.emit(int(100 * done / total))
 
 class OWImagePreprocessor(OWWidget):
     name = "Preprocess Images"
@@ -66,17 +144,22 @@ class OWImagePreprocessor(OWWidget):
 
     class Outputs:
         preprocessed_data = Output("Preprocessed Data", Table)
+        profile = Output("Profile", Table)
 
     do_grayscale = Setting(False)
     do_resize = Setting(True)
     resize_width = Setting(224)
     resize_height = Setting(224)
     do_normalize = Setting(False)
+    workers = Setting(1)
 
     def __init__(self):
         super().__init__()
         self.data = None
         self.output_dir = None
+        self.worker = None
+        # settings changed during a run; preprocess again once it has stopped
+        self._rerun = False
         self.layout_controlArea()
         self.layout_mainArea()
 
@@ -115,6 +198,17 @@ class OWImagePreprocessor(OWWidget):
         size_layout.addWidget(self.height_spin)
         size_frame.setLayout(size_layout)
 
+        workers_frame = QFrame()
+        workers_layout = QHBoxLayout()
+        workers_layout.addWidget(QLabel("Worker Processes:"))
+        self.workers_spin = QSpinBox()
+        self.workers_spin.setRange(1, os.cpu_count() or 1)
+        self.workers_spin.setValue(self.workers)
+        self.workers_spin.setToolTip("Number of processes preprocessing images in parallel.")
+        self.workers_spin.valueChanged.connect(lambda val: setattr(self, "workers", val))
+        workers_layout.addWidget(self.workers_spin)
+        workers_frame.setLayout(workers_layout)
+
         a = self.controlArea.layout().addWidget
         a(self.info_label)
         a(select_button)
@@ -122,6 +216,7 @@ class OWImagePreprocessor(OWWidget):
         a(self.norm_cb)
         a(self.resize_cb)
         a(size_frame)
+        a(workers_frame)
 
         self.controlArea.layout().setAlignment(Qt.AlignTop)
 
@@ -177,7 +272,13 @@ class OWImagePreprocessor(OWWidget):
         self.show_preview_image()
 
     def try_preprocess(self):
+        if self.worker is not None and self.worker.isRunning():
+            # two runs must not write the same outputs and manifest at once
+            self._rerun = True
+            self.worker.stop()
+            return
         if self.data is not None and self.output_dir:
+            self.error()
             self.info_label.setText("Preprocessing...")
             self.progressBarInit()
 
@@ -187,27 +288,56 @@ class OWImagePreprocessor(OWWidget):
                 self.do_resize,
                 self.resize_width,
                 self.resize_height,
-                self.do_normalize
+                self.do_normalize,
+                self.workers
             )
             self.worker.progress.connect(self.progressBarSet)
             self.worker.finished.connect(self.handle_preprocessed)
+            self.worker.failed.connect(self.handle_failed)
             self.worker.start()
 
+    def _finish_run(self):
+        """Common end of a run; returns True if it was superseded."""
+        self.worker.wait()  # finished/failed are emitted just before run() returns
+        self.progressBarFinished()
+        if not self._rerun:
+            return False
+        self._rerun = False
+        self.try_preprocess()
+        return True
+
     def handle_preprocessed(self, table: Table):
+        if self._finish_run():
+            return
+        if table is None:
+            self.info_label.setText("Preprocessing stopped.")
+            return
         self.Outputs.preprocessed_data.send(table)
-        self.progressBarFinished()
-        self.info_label.setText("Preprocessing complete.")
-
-    def preprocess_image(self, img_path: str) -> QPixmap:
-        img = cv2.imread(img_path)
-        if self.do_grayscale:
-            img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        if self.do_resize:
-            img = cv2.resize(img, (self.resize_width, self.resize_height))
-        if self.do_normalize:
-            img = cv2.normalize(img, None, 0, 255, cv2.NORM_MINMAX)
-        img = img.astype(np.uint8)
-        is_success, buffer = cv2.imencode(".png", img)
+        self.info_label.setText(f"Preprocessing complete.\n"
+                                f"{self.worker.processed} processed, {self.worker.reused} reused.\n"
+                                + self.worker.profiler.format_summary())
+        self.Outputs.profile.send(self.worker.profiler.to_table())
+
+    def handle_failed(self, message):
+        if self._finish_run():
+            return
+        self.info_label.setText("Preprocessing failed.")
+        self.error(message)
+
+    def onDeleteWidget(self):
+        if self.worker is not None:
+            self.worker.stop()
+            self.worker.wait()
+        super().onDeleteWidget()
+
+    def preprocess_image(self, img) -> QPixmap:
+        img = preprocess_array(img, self.do_grayscale, self.do_resize,
+                               self.resize_width, self.resize_height, self.do_normalize)
+        return self.to_pixmap(img)
+
+    @staticmethod
+    def to_pixmap(img) -> QPixmap:
+        _, buffer = cv2.imencode(".png", img)
         pixmap = QPixmap()
         pixmap.loadFromData(buffer, "png")
         return pixmap
@@ -223,9 +353,12 @@ class OWImagePreprocessor(OWWidget):
             # Get the first image path
             path = self.data[0].metas[image_col_index]
             full_path = os.path.join(origin, path)
-            pixmap = QPixmap(full_path)
-            self.image_label.setPixmap(pixmap)
-            preprocessed_pixmap = self.preprocess_image(full_path)
+            # settings changes re-render the preview, so keep the decoded source around
+            image = load_preview(full_path, cache=default_cache())
+            if image is None:
+                raise ValueError(f"Cannot read {path}")
+            self.image_label.setPixmap(self.to_pixmap(image))
+            preprocessed_pixmap = self.preprocess_image(image)
             self.aug_image_label.setPixmap(preprocessed_pixmap)
         except Exception as e:
             self.image_label.setText(f"Error loading preview:\n{str(e)}")
@@ -3,38 +3,183 @@ from Orange.widgets.settings import Setting
 from Orange.widgets.widget import Output, Input
 from Orange.data import Table
 
-from PyQt5.QtWidgets import QLabel, QPushButton, QSpinBox, QComboBox
-from PyQt5.QtCore import Qt, QCoreApplication
+from PyQt5.QtWidgets import QLabel, QPushButton, QSpinBox, QDoubleSpinBox, QComboBox, QCheckBox
+from PyQt5.QtCore import Qt, QThread, QTimer, pyqtSignal
 from PyQt5.QtGui import QFont
 
 import os
-import cv2
 import numpy as np
-from pyqtgraph import PlotWidget, PlotCurveItem, ScatterPlotItem
 
-from keras.utils import to_categorical
-from keras.models import clone_model
-from keras.callbacks import Callback
-from sklearn.preprocessing import LabelEncoder
-
-class KerasCallback(Callback):
-    def __init__(self, widget):
+from orangecontrib.imagenets.util.inference import (
+    InferenceBackend, model_input_scale, configure_tf_threads
+)
+from orangecontrib.imagenets.util.lazy_import import lazy_import, preload
+from orangecontrib.imagenets.util.image_loader import ImageBatchLoader
+from orangecontrib.imagenets.util.image_table import resolve_image_files
+from orangecontrib.imagenets.util.augment import AugmentSpec
+from orangecontrib.imagenets.util.image_cache import default_cache, clear_default_cache
+from orangecontrib.imagenets.util.profiling import StageProfiler
+
+# TensorFlow/Keras are imported on first use, not at widget discovery
+kutils = lazy_import("keras.utils")
+kmodels = lazy_import("keras.models")
+koptimizers = lazy_import("keras.optimizers")
+skpreprocessing = lazy_import("sklearn.preprocessing")
+
+class TrainingStopped(Exception):
+    pass
+
+OPTIMIZERS = {"adam": "Adam", "adamw": "AdamW", "sgd": "SGD", "rmsprop": "RMSprop"}
+
+class TrainWorker(QThread):
+    progress = pyqtSignal(int)
+    epoch_end = pyqtSignal(int, object)
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+    def __init__(self, model, data, batch_size, epochs, streaming=False, augmentation=None,
+                 optimizer="adam", learning_rate=1e-3, jit_compile=False, steps_per_execution=1,
+                 intra_op_threads=0, inter_op_threads=0, cache=None):
         super().__init__()
-        self.widget = widget
+        self.model = model
+        self.data = data
+        self.batch_size = batch_size
+        self.epochs = epochs
+        self.streaming = streaming
+        self.augmentation = augmentation
+        self.optimizer = optimizer
+        self.learning_rate = learning_rate
+        self.jit_compile = jit_compile
+        self.steps_per_execution = max(1, int(steps_per_execution))
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+        self.cache = cache
+        self.threads_applied = True
+        self.stop_requested = False
+        self.profiler = StageProfiler("Train")
+
+    def stop(self):
+        """Ask the run to end; KerasCallback stops fitting after the current batch."""
+        self.stop_requested = True
+
+    def image_paths(self):
+        """
+        Paths of the images that exist, the rows of ``data`` they belong to
+        and their file signatures for the image cache.
+        """
+        paths, signatures = resolve_image_files(self.data, self.profiler)
+        rows = np.array([i for i, s in enumerate(signatures) if s is not None], dtype=int)
+        return paths[rows], rows, [signatures[i] for i in rows]
+
+    def class_labels(self, rows):
+        """Class values of ``rows`` as strings, read from ``data.Y`` at once."""
+        class_var = self.data.domain.class_var
+        if class_var is None:
+            raise ValueError("Training needs data with a class variable.")
+        y = self.data.Y[rows]
+        if not class_var.is_discrete:
+            return [class_var.str_val(v) for v in y]
+        # missing classes read as "?", as str(row.get_class()) gives
+        values = np.array(list(class_var.values) + ["?"])
+        return values[np.where(np.isnan(y), len(values) - 1, y).astype(int)]
+
+    def prepare_data(self):
+        """Decoded images as one uint8 array; normalisation happens per batch."""
+        X = []
+        loaded = []
+
+        paths, rows, signatures = self.image_paths()
+        loader = ImageBatchLoader(paths, batch_size=self.batch_size,
+                                  cache=self.cache, profiler=self.profiler, signatures=signatures)
+        for indices, images in loader:
+            if self.stop_requested:
+                raise TrainingStopped()
+            if images is None:
+                continue
+            X.append(images)
+            loaded.append(rows[indices])
+
+        if not X:
+            raise ValueError("None of the images could be read.")
+        X = np.concatenate(X)
+        y = self.class_labels(np.concatenate(loaded))
+        le = skpreprocessing.LabelEncoder()
+        y_int = le.fit_transform(y)
+        y_cat = kutils.to_categorical(y_int)
+        return X, y_cat, le
+
+    def prepare_dataset(self, scale):
+        from orangecontrib.imagenets.util.image_dataset import ImageDataset
+
+        paths, rows, _ = self.image_paths()
+        y = self.class_labels(rows)
+
+        le = skpreprocessing.LabelEncoder()
+        y_cat = kutils.to_categorical(le.fit_transform(y))
+        # no image cache: its memory tier would undo the batch x queue memory bound of streaming
+        dataset = ImageDataset(paths, y_cat, batch_size=self.batch_size, cache=None,
+                               augment=self.augmentation, profiler=self.profiler, scale=scale)
+        return dataset, le
+
+    def run(self):
+        try:
+            model = self.train()
+        except TrainingStopped:
+            self.finished.emit(None)
+            return
+        except Exception as e:
+            self.failed.emit(str(e))
+            return
+        self.profiler.finish()
+        self.finished.emit(model)
+
+    def train(self):
+        from orangecontrib.imagenets.util.image_dataset import ArrayDataset
+        from orangecontrib.imagenets.util.keras_callbacks import KerasCallback
 
-    def on_epoch_end(self, epoch, logs=None):
-        logs = logs or {}
-        self.widget.loss_values.append(logs.get('loss', 0))
-        self.widget.accuracy_values.append(logs.get('accuracy', 0))
+        if self.intra_op_threads or self.inter_op_threads:
+            self.threads_applied = configure_tf_threads(self.intra_op_threads, self.inter_op_threads)
 
-        epochs = list(range(1, len(self.widget.loss_values) + 1))
-        self.widget.loss_curve.setData(epochs, self.widget.loss_values)
-        self.widget.accuracy_curve.setData(epochs, self.widget.accuracy_values)
-        self.widget.update_tooltips(self.widget.loss_scatter, self.widget.loss_values, "Loss")
-        self.widget.update_tooltips(self.widget.accuracy_scatter, self.widget.accuracy_values, "Accuracy")
+        model = kmodels.clone_model(self.model)
+        model.set_weights(self.model.get_weights())
+        optimizer = koptimizers.get({"class_name": self.optimizer,
+                                     "config": {"learning_rate": self.learning_rate}})
+        model.compile(optimizer=optimizer, loss='categorical_crossentropy', metrics=['accuracy'],
+                      # unchecked keeps Keras' default, which still uses XLA where it helps
+                      jit_compile=True if self.jit_compile else "auto",
+                      steps_per_execution=self.steps_per_execution)
+        # the builder's default Rescaling layer already maps pixels to [0, 1]
+        scale = model_input_scale(model)
+
+        if self.streaming:
+            dataset, le = self.prepare_dataset(scale)
+            with self.profiler.stage("train"):
+                history = model.fit(
+                    dataset,
+                    epochs=self.epochs,
+                    verbose=0,
+                    callbacks=[KerasCallback(self)]
+                )
+            n_samples = len(dataset.paths)
+        else:
+            X, y, le = self.prepare_data()
+            with self.profiler.stage("train"):
+                history = model.fit(
+                    ArrayDataset(X, y, batch_size=self.batch_size, augment=self.augmentation,
+                                 scale=scale),
+                    epochs=self.epochs,
+                    verbose=0,
+                    callbacks=[KerasCallback(self)]
+                )
+            n_samples = len(X)
+        # Stop ends fitting early; count only the epochs that ran
+        self.profiler.count(n_samples * len(history.epoch))
+        if self.stop_requested:
+            # a partly trained model is not sent on as if training had completed
+            raise TrainingStopped()
 
-        self.widget.progressBarSet(100 * (epoch + 1) / self.widget.epochs)
-        QCoreApplication.processEvents()
+        model.class_names = le.classes_.tolist()
+        return model
 
 class OWImageTrainAndScore(widget.OWWidget):
     name = "Train ImageNet"
@@ -45,24 +190,50 @@ class OWImageTrainAndScore(widget.OWWidget):
     class Inputs:
         model = Input("Learner", object, auto_summary=False)
         data = Input("Evaluation Data", Table)
+        augmentation = Input("Augmentation", AugmentSpec, auto_summary=False)
 
     class Outputs:
         trained_model = Output("Trained Model", object, auto_summary=False)
+        profile = Output("Profile", Table)
 
     batch_size = Setting(32)
     dropout_rate = Setting(0.5)
     epochs = Setting(10)
+    streaming = Setting(False)
+    optimizer = Setting("adam")
+    learning_rate = Setting(0.001)
+    jit_compile = Setting(False)
+    steps_per_execution = Setting(1)
+    intra_op_threads = Setting(0)
+    inter_op_threads = Setting(0)
+    disk_cache_gb = Setting(0)
+
+    # minimum time between redraws of the training graph
+    PLOT_INTERVAL_MS = 250
 
     def __init__(self):
         super().__init__()
         self.model = None
         self.data = None
+        self.augmentation = None
+        self.worker = None
+        self._running = False
+        # inputs changed during a run; train again once it has stopped
+        self._rerun = False
 
         self.loss_values = []
         self.accuracy_values = []
+        self.epoch_times = []
+        self._plotted = 0
+
+        self.plot_timer = QTimer(self)
+        self.plot_timer.setSingleShot(True)
+        self.plot_timer.setInterval(self.PLOT_INTERVAL_MS)
+        self.plot_timer.timeout.connect(self.update_plot)
 
         self.init_controls()
         self.setup_training_graph()
+        preload("keras", "sklearn.preprocessing")
 
     def init_controls(self):
         self.controlArea.layout().addWidget(QLabel("Batch Size:"))
@@ -87,15 +258,90 @@ class OWImageTrainAndScore(widget.OWWidget):
         self.epochs_spin.setValue(self.epochs)
         self.epochs_spin.setToolTip("Number of epochs of training .")
         self.epochs_spin.valueChanged.connect(self._on_epochs_changed)
-        self.controlArea.layout().addWidget(self.epochs_spin)        
+        self.controlArea.layout().addWidget(self.epochs_spin)
+
+        self.streaming_cb = QCheckBox("Stream images from disk")
+        self.streaming_cb.setChecked(self.streaming)
+        self.streaming_cb.setToolTip("Load images per batch instead of holding the whole dataset in memory.")
+        self.streaming_cb.stateChanged.connect(self._on_streaming_changed)
+        self.controlArea.layout().addWidget(self.streaming_cb)
+
+        self.controlArea.layout().addWidget(QLabel("Optimizer:"))
+        self.optimizer_box = QComboBox()
+        for name, label in OPTIMIZERS.items():
+            self.optimizer_box.addItem(label, name)
+        self.optimizer_box.setCurrentIndex(max(0, self.optimizer_box.findData(self.optimizer)))
+        self.optimizer_box.currentIndexChanged.connect(self._on_optimizer_changed)
+        self.controlArea.layout().addWidget(self.optimizer_box)
+
+        self.controlArea.layout().addWidget(QLabel("Learning Rate:"))
+        self.learning_rate_spin = QDoubleSpinBox()
+        self.learning_rate_spin.setDecimals(5)
+        self.learning_rate_spin.setRange(0.00001, 1.0)
+        self.learning_rate_spin.setSingleStep(0.0001)
+        self.learning_rate_spin.setValue(self.learning_rate)
+        self.learning_rate_spin.valueChanged.connect(self._on_learning_rate_changed)
+        self.controlArea.layout().addWidget(self.learning_rate_spin)
+
+        self.jit_cb = QCheckBox("XLA compile (jit_compile)")
+        self.jit_cb.setChecked(self.jit_compile)
+        self.jit_cb.setToolTip("Always fuse the training step with XLA; unchecked leaves Keras to decide.\n"
+                               "The first epoch is slower while it compiles.")
+        self.jit_cb.stateChanged.connect(self._on_jit_changed)
+        self.controlArea.layout().addWidget(self.jit_cb)
+
+        self.controlArea.layout().addWidget(QLabel("Steps per Execution:"))
+        self.steps_spin = QSpinBox()
+        self.steps_spin.setRange(1, 256)
+        self.steps_spin.setValue(self.steps_per_execution)
+        self.steps_spin.setToolTip("Batches run per call into the compiled training step.")
+        self.steps_spin.valueChanged.connect(self._on_steps_changed)
+        self.controlArea.layout().addWidget(self.steps_spin)
+
+        self.controlArea.layout().addWidget(QLabel("Intra-op / Inter-op Threads:"))
+        self.intra_spin = QSpinBox()
+        self.inter_spin = QSpinBox()
+        for spin, value, tip in ((self.intra_spin, self.intra_op_threads, "Threads used within one operation."),
+                                 (self.inter_spin, self.inter_op_threads, "Operations run in parallel.")):
+            spin.setRange(0, os.cpu_count() or 1)
+            spin.setSpecialValueText("Auto")
+            spin.setValue(value)
+            spin.setToolTip(tip + "\nOnly applies before TensorFlow has started in this session.")
+            self.controlArea.layout().addWidget(spin)
+        self.intra_spin.valueChanged.connect(self._on_intra_changed)
+        self.inter_spin.valueChanged.connect(self._on_inter_changed)
+
+        self.controlArea.layout().addWidget(QLabel("Image Cache on Disk:"))
+        self.disk_cache_spin = QSpinBox()
+        self.disk_cache_spin.setRange(0, 1000)
+        self.disk_cache_spin.setSuffix(" GB")
+        self.disk_cache_spin.setSpecialValueText("Off")
+        self.disk_cache_spin.setValue(self.disk_cache_gb)
+        self.disk_cache_spin.setToolTip("Also keep decoded images on disk, up to this size, "
+                                        "so later sessions skip decoding.\n"
+                                        "Streaming reads images without any cache.")
+        self.disk_cache_spin.valueChanged.connect(self._on_disk_cache_changed)
+        self.controlArea.layout().addWidget(self.disk_cache_spin)
+        clear_cache_button = QPushButton("Clear Image Cache")
+        clear_cache_button.setToolTip("Delete all decoded images kept in memory and on disk.")
+        clear_cache_button.clicked.connect(self.clear_image_cache)
+        self.controlArea.layout().addWidget(clear_cache_button)
 
         self.train_button = QPushButton("Train")
-        self.train_button.clicked.connect(self.train)
+        self.train_button.clicked.connect(self._on_train_clicked)
         self.controlArea.layout().addWidget(self.train_button)
 
+        self.epoch_time_label = QLabel()
+        self.controlArea.layout().addWidget(self.epoch_time_label)
+        self.profile_label = QLabel()
+        self.controlArea.layout().addWidget(self.profile_label)
+
         self.controlArea.layout().setAlignment(Qt.AlignTop)
 
     def setup_training_graph(self):
+        # pyqtgraph is only needed once the widget is shown, not at widget discovery
+        from pyqtgraph import PlotWidget, PlotCurveItem, ScatterPlotItem
+
         self.graph = PlotWidget(title="Training Progress")
         self.graph.setLabel('left', 'Value')
         self.graph.setLabel('bottom', 'Epoch')
@@ -122,35 +368,87 @@ class OWImageTrainAndScore(widget.OWWidget):
         self.graph.addItem(self.loss_scatter)
         self.graph.addItem(self.accuracy_scatter)
 
+        self.loss_scatter.sigHovered.connect(self.on_hover)
+        self.accuracy_scatter.sigHovered.connect(self.on_hover)
+
         self.mainArea.layout().addWidget(self.graph)
 
-    def update_tooltips(self, scatter_item, values, label):
-        spots = [{
-            'pos': (i + 1, v),
-            'data': f"{label} - Epoch {i + 1}\nValue: {v:.4f}",
+    def on_hover(self, _item, spots, *_):
+        if len(spots):
+            self.graph.setToolTip(spots[0].data())
+        else:
+            self.graph.setToolTip("")
+
+    def add_tooltip_spots(self, scatter_item, values, start, label):
+        scatter_item.addPoints([{
+            'pos': (i + 1, values[i]),
+            'data': f"{label} - Epoch {i + 1}\nValue: {values[i]:.4f}",
             'brush': scatter_item.opts['brush'],
-        } for i, v in enumerate(values)]
-        scatter_item.setData(spots)
+        } for i in range(start, len(values))])
 
-        def on_hover(spots):
-            if spots:
-                self.graph.setToolTip(spots[0].data())
-            else:
-                self.graph.setToolTip("")
-        scatter_item.sigHovered.connect(on_hover)
+    def clear_plot(self):
+        self.loss_values.clear()
+        self.accuracy_values.clear()
+        self.epoch_times.clear()
+        self.epoch_time_label.setText("")
+        self._plotted = 0
+        self.loss_curve.setData([], [])
+        self.accuracy_curve.setData([], [])
+        self.loss_scatter.clear()
+        self.accuracy_scatter.clear()
+
+    def on_epoch_end(self, epoch, logs):
+        self.loss_values.append(logs['loss'])
+        self.accuracy_values.append(logs['accuracy'])
+        self.epoch_times.append(logs['time'])
+        self.show_epoch_time()
+        if not self.plot_timer.isActive():
+            self.plot_timer.start()
+
+    def show_epoch_time(self):
+        text = f"Epoch {len(self.epoch_times)}: {self.epoch_times[-1]:.2f} s"
+        if len(self.epoch_times) > 1:
+            # the first epoch includes tracing and compilation
+            text += f" · mean after first {np.mean(self.epoch_times[1:]):.2f} s"
+        self.epoch_time_label.setText(text)
+
+    def update_plot(self):
+        if self._plotted == len(self.loss_values):
+            return
+        epochs = np.arange(1, len(self.loss_values) + 1)
+        self.loss_curve.setData(epochs, self.loss_values)
+        self.accuracy_curve.setData(epochs, self.accuracy_values)
+        # only the new epochs get scatter spots; existing ones are kept
+        self.add_tooltip_spots(self.loss_scatter, self.loss_values, self._plotted, "Loss")
+        self.add_tooltip_spots(self.accuracy_scatter, self.accuracy_values, self._plotted, "Accuracy")
+        self._plotted = len(self.loss_values)
 
     @Inputs.model
     def set_model(self, model):
+        self.error()
+        if isinstance(model, InferenceBackend):
+            self.error(f"{model.name} models cannot be trained; load a Keras model.")
+            model = None
         self.model = model
-        if self.model and self.data:
-            self.train()
+        self.inputs_changed()
 
     @Inputs.data
     def set_data(self, data):
         self.data = data
-        if self.model and self.data:
+        self.inputs_changed()
+
+    def inputs_changed(self):
+        if self._running:
+            # the running model belongs to the old inputs; restart when it stops
+            self._rerun = True
+            self.worker.stop()
+        elif self.model and self.data:
             self.train()
 
+    @Inputs.augmentation
+    def set_augmentation(self, augmentation):
+        self.augmentation = augmentation
+
     def _on_batch_size_changed(self, value):
         self.batch_size = value
 
@@ -160,66 +458,112 @@ class OWImageTrainAndScore(widget.OWWidget):
     def _on_epochs_changed(self, value):
         self.epochs = int(value)
 
-    def prepare_data(self):
-        X = []
-        y = []
-
-        domain = self.data.domain
-        image_col = None
-        origin = None
-
-        for var in domain.metas:
-            if var.attributes.get("type") == "image":
-                image_col = var
-                origin = var.attributes.get("origin")
-                break
-        image_col_index = domain.metas.index(image_col)
-
-        for row in self.data:
-            path = row.metas[image_col_index]
-            img_path = os.path.join(origin, path)
-            if not os.path.exists(img_path):
-                continue
-            img = cv2.imread(img_path)
-            img = cv2.resize(img, (224, 224))
-            img = img.astype(np.float32) / 255.0
-            X.append(img)
-            y.append(str(row.get_class()))
-
-        X = np.array(X)
-        le = LabelEncoder()
-        y_int = le.fit_transform(y)
-        y_cat = to_categorical(y_int)
-        return X, y_cat, le
+    def _on_streaming_changed(self):
+        self.streaming = self.streaming_cb.isChecked()
+
+    def _on_optimizer_changed(self):
+        self.optimizer = self.optimizer_box.currentData()
+
+    def _on_learning_rate_changed(self, value):
+        self.learning_rate = float(value)
+
+    def _on_jit_changed(self):
+        self.jit_compile = self.jit_cb.isChecked()
+
+    def _on_steps_changed(self, value):
+        self.steps_per_execution = int(value)
+
+    def _on_intra_changed(self, value):
+        self.intra_op_threads = int(value)
+
+    def _on_inter_changed(self, value):
+        self.inter_op_threads = int(value)
+
+    def _on_disk_cache_changed(self, value):
+        self.disk_cache_gb = value
+
+    def clear_image_cache(self):
+        clear_default_cache()
+        self.profile_label.setText("Image cache cleared.")
+
+    def _on_train_clicked(self):
+        if self._running:
+            self._rerun = False
+            self.worker.stop()
+            self.train_button.setEnabled(False)
+        else:
+            self.train()
 
     def train(self):
         if self.model is None or self.data is None:
             self.error("Missing model or data.")
             return
+        if self._running:
+            return
+        self.error()
+        self.warning()
 
-        model = clone_model(self.model)
-        model.set_weights(self.model.get_weights())
-
-        self.loss_values.clear()
-        self.accuracy_values.clear()
+        self.clear_plot()
         self.progressBarInit()
-
-        X, y, le = self.prepare_data()
-        model.compile(optimizer='adam', loss='categorical_crossentropy', metrics=['accuracy'])
-
-        model.fit(
-            X, y,
-            batch_size=self.batch_size,
-            epochs=self.epochs,
-            verbose=0,
-            callbacks=[KerasCallback(self)]
+        self._running = True
+        self.train_button.setText("Stop")
+
+        self.worker = TrainWorker(
+            self.model, self.data,
+            self.batch_size, self.epochs,
+            self.streaming, self.augmentation,
+            self.optimizer, self.learning_rate, self.jit_compile, self.steps_per_execution,
+            self.intra_op_threads, self.inter_op_threads,
+            cache=default_cache(self.disk_cache_gb << 30)
         )
-
-        model.class_names = le.classes_.tolist()
-
+        self.worker.progress.connect(self.progressBarSet)
+        self.worker.epoch_end.connect(self.on_epoch_end)
+        self.worker.finished.connect(self.handle_trained)
+        self.worker.failed.connect(self.handle_failed)
+        self.worker.start()
+
+    def _finish_run(self):
+        """Common end of a run; returns True if it was superseded by new inputs."""
+        self.worker.wait()  # finished/failed are emitted just before run() returns
+        self._running = False
+        self.plot_timer.stop()
+        self.update_plot()
         self.progressBarFinished()
+        self.train_button.setText("Train")
+        self.train_button.setEnabled(True)
+        if not self._rerun:
+            return False
+        self._rerun = False
+        if self.model and self.data:
+            self.train()
+        else:
+            self.Outputs.trained_model.send(None)
+        return True
+
+    def handle_trained(self, model):
+        if self._finish_run():
+            return
+        if model is None:
+            self.profile_label.setText("Training stopped.")
+            return
+        if not self.worker.threads_applied:
+            self.warning("Thread settings take effect after restarting Orange; "
+                         "TensorFlow was already running.")
+        self.profile_label.setText(self.worker.profiler.format_summary())
+        self.Outputs.profile.send(self.worker.profiler.to_table())
         self.Outputs.trained_model.send(model)
 
+    def handle_failed(self, message):
+        if self._finish_run():
+            return
+        self.error(message)
+
+    def onDeleteWidget(self):
+        if self._running:
+            self.worker.stop()
+            self.worker.wait()
+        super().onDeleteWidget()
+
 if __name__ == "__main__":
     from Orange.widgets.utils.widgetpreview import WidgetPreview
     # from orangecontrib.imageanalytics.import_images import ImportImages, scan
@@ -227,4 +571,4 @@ if __name__ == "__main__":
     # data_dir = "/home/chris/Downloads/BilddatenLungenentzuendung/training/krank"
     # images = import_images.image_meta(scan(data_dir))
     # data, err = import_images(data_dir)
-    WidgetPreview(OWImageTrainAndScore).run()
\ No newline at end of file
+    WidgetPreview(OWImageTrainAndScore).run()
@@ -1,14 +1,25 @@
 from AnyQt.QtWidgets import (
     QComboBox, QPushButton, QVBoxLayout, QHBoxLayout, QLabel,
-    QWidget, QScrollArea, QFrame, QFormLayout, QSpinBox, QDoubleSpinBox, QLineEdit, QMessageBox
+    QWidget, QScrollArea, QFrame, QFormLayout, QSpinBox, QDoubleSpinBox, QLineEdit, QMessageBox,
+    QFileDialog
 )
-from AnyQt.QtCore import Qt
+from AnyQt.QtCore import Qt, QTimer
 from Orange.widgets import gui
 from Orange.widgets.widget import OWWidget, Output
 from Orange.widgets.settings import Setting
-import keras.layers as klayers
-import keras.models as kmodels
 import json
+import os
+from collections import OrderedDict
+
+from orangecontrib.imagenets.util.lazy_import import lazy_import
+from orangecontrib.imagenets.util.model_analysis import (
+    analyse_layers, layers_input_shape, totals, format_layer, human
+)
+from orangecontrib.imagenets.util.model_profile import ModelProfileWorker, format_report, model_input_shape
+from orangecontrib.imagenets.util.model_io import SAVE_FORMATS, SaveWorker, with_extension
+
+klayers = lazy_import("keras.layers")
+kmodels = lazy_import("keras.models")
 
 PREBUILT_MODELS = {
     "None": [],
@@ -47,6 +58,12 @@ class OWImageNetBuilder(OWWidget):
     priority = 10
 
     model_config = Setting("[]")  # JSON list of layers
+    auto_commit = Setting(True)
+    last_dir = Setting(os.path.expanduser("~"))
+
+    # quiet period after the last edit before a model is built and sent
+    BUILD_DELAY_MS = 400
+    MODEL_CACHE_SIZE = 16
 
     class Outputs:
         model = Output("Model", object, auto_summary=False)
@@ -54,6 +71,15 @@ class OWImageNetBuilder(OWWidget):
     def __init__(self):
         super().__init__()
         self.model_layers = []
+        self._model_cache = OrderedDict()
+        self._stats_labels = []
+        self._export_worker = None
+        self.profile_worker = None
+
+        self._build_timer = QTimer(self)
+        self._build_timer.setSingleShot(True)
+        self._build_timer.setInterval(self.BUILD_DELAY_MS)
+        self._build_timer.timeout.connect(self.commit.deferred)
 
         self._init_controls()
         self._init_main_area()
@@ -61,13 +87,19 @@ class OWImageNetBuilder(OWWidget):
 
     def _init_controls(self):
         export_box = gui.widgetBox(self.controlArea, "Export Model")
-        export_h5_btn = QPushButton("Export to .h5")
-        export_h5_btn.clicked.connect(self._export_model_h5)
-        export_box.layout().addWidget(export_h5_btn)
-
-        export_json_btn = QPushButton("Export to JSON")
-        export_json_btn.clicked.connect(self._export_model_json)
-        export_box.layout().addWidget(export_json_btn)
+        self._export_buttons = []
+        for fmt, label in (("keras", "Export to .keras"), ("h5", "Export to .h5"),
+                           ("json", "Export to JSON")):
+            btn = QPushButton(label)
+            btn.clicked.connect(lambda _, fmt=fmt: self._export_model(fmt))
+            export_box.layout().addWidget(btn)
+            self._export_buttons.append(btn)
+
+        profile_box = gui.widgetBox(self.controlArea, "Profile")
+        self.profile_btn = QPushButton("Profile on CPU")
+        self.profile_btn.setToolTip("Time forward passes of the current model on synthetic input.")
+        self.profile_btn.clicked.connect(self.profile_model)
+        profile_box.layout().addWidget(self.profile_btn)
 
         box = gui.widgetBox(self.controlArea, "Prebuilt ImageNets")
 
@@ -85,6 +117,7 @@ class OWImageNetBuilder(OWWidget):
             btn.clicked.connect(lambda checked, l=layer_type: self.add_layer(l))
             layer_box.layout().addWidget(btn)
         layer_box.layout().setAlignment(Qt.AlignTop)
+        gui.auto_send(self.controlArea, self, "auto_commit")
         self.controlArea.layout().setAlignment(Qt.AlignTop)
 
     def _init_main_area(self):
@@ -97,6 +130,13 @@ class OWImageNetBuilder(OWWidget):
         clear_btn.clicked.connect(self.clear_layers)
         self.main_layout.addWidget(clear_btn)
 
+        self.summary_label = QLabel()
+        self.main_layout.addWidget(self.summary_label)
+
+        self.profile_label = QLabel()
+        self.profile_label.setTextInteractionFlags(Qt.TextSelectableByMouse)
+        self.main_layout.addWidget(self.profile_label)
+
         self.layer_container = QVBoxLayout()
         self.main_layout.addLayout(self.layer_container)
 
@@ -136,9 +176,27 @@ class OWImageNetBuilder(OWWidget):
             if widget:
                 widget.deleteLater()
 
+        self._stats_labels = []
         for i, layer_config in enumerate(self.model_layers):
             widget = self._build_layer_widget(layer_config, i)
             self.layer_container.addWidget(widget)
+        self._refresh_analysis()
+
+    def _refresh_analysis(self, input_shape=None):
+        """
+        Static analysis of the current config. Until a model is built, the
+        input shape is read from the config (see ``layers_input_shape``).
+        """
+        if input_shape is None:
+            input_shape = layers_input_shape(self.model_layers)
+        results = analyse_layers(self.model_layers, input_shape)
+        for i, label in enumerate(self._stats_labels):
+            label.setText(format_layer(results[i]) if i < len(results) else "")
+        total = totals(results)
+        self.summary_label.setText(
+            f"Input {'×'.join(map(str, input_shape))} · total params {human(total['params'])} · "
+            f"activations {human(total['activation_bytes'], binary=True)}B · "
+            f"MACs {human(total['macs'])}")
 
     def _build_layer_widget(self, config, index):
         frame = QFrame()
@@ -147,6 +205,11 @@ class OWImageNetBuilder(OWWidget):
         frame.setLayout(layout)
 
         layout.addRow(QLabel(f"Layer: {config['type']}"))
+        stats_label = QLabel()
+        stats_label.setToolTip("Output shape, parameters, activation memory and "
+                               "multiply-accumulates, computed from the configuration.")
+        self._stats_labels.append(stats_label)
+        layout.addRow(stats_label)
 
         for key, val in config.items():
             if key == "type":
@@ -215,13 +278,44 @@ class OWImageNetBuilder(OWWidget):
 
     def _update_model_config(self):
         self.model_config = json.dumps(self.model_layers)
+        self._refresh_analysis()
+        self._build_timer.start()
+
+    @gui.deferred
+    def commit(self):
+        self._build_timer.stop()
         try:
-            model = self._build_keras_model()
+            model = self._model_copy()
+            self._refresh_analysis(model_input_shape(model))
             self.Outputs.model.send(model)
         except Exception as e:
             print(f"Model build failed: {e}")
             self.Outputs.model.send(None)
 
+    def _cached_keras_model(self):
+        key = json.dumps(self.model_layers, sort_keys=True)
+        model = self._model_cache.get(key)
+        if model is None:
+            model = self._build_keras_model()
+            self._model_cache[key] = model
+            if len(self._model_cache) > self.MODEL_CACHE_SIZE:
+                self._model_cache.popitem(last=False)
+        else:
+            self._model_cache.move_to_end(key)
+        return model
+
+    def _model_copy(self):
+        """
+        A copy of the cached model for the current config, with the same
+        initial weights. Cached models are never handed out: Train would fit
+        them in place and Profile would build them on its worker thread.
+        """
+        cached = self._cached_keras_model()
+        model = kmodels.clone_model(cached)
+        if cached.built:
+            model.set_weights(cached.get_weights())
+        return model
+
     def _build_keras_model(self):
         model = kmodels.Sequential()
         for layer_cfg in self.model_layers:
@@ -231,31 +325,81 @@ class OWImageNetBuilder(OWWidget):
             model.add(layer_class(**config))
         return model
 
+    def profile_model(self):
+        try:
+            model = self._model_copy()
+        except Exception as e:
+            QMessageBox.warning(self, "Profile Failed", str(e))
+            return
+        self.profile_btn.setEnabled(False)
+        self.profile_label.setText("Profiling...")
+        self.progressBarInit()
+        self.profile_worker = ModelProfileWorker(model)
+        self.profile_worker.progress.connect(self.progressBarSet)
+        self.profile_worker.finished.connect(self._on_profiled)
+        self.profile_worker.failed.connect(self._on_profile_failed)
+        self.profile_worker.start()
+
+    def _on_profiled(self, report):
+        self.progressBarFinished()
+        self.profile_btn.setEnabled(True)
+        self.profile_label.setText(format_report(report))
+
+    def _on_profile_failed(self, message):
+        self.progressBarFinished()
+        self.profile_btn.setEnabled(True)
+        self.profile_label.setText(f"Profiling failed: {message}")
+
+    def onDeleteWidget(self):
+        self._build_timer.stop()
+        # an interrupted save would leave a half-written model file
+        for worker in (self.profile_worker, self._export_worker):
+            if worker is not None:
+                worker.wait()
+        super().onDeleteWidget()
+
     def _load_saved_config(self):
         try:
             self.model_layers = json.loads(self.model_config)
             self._rebuild_ui()
-            self._update_model_config()
         except Exception as e:
             print(f"Failed to load saved config: {e}")
             self.clear_layers()
+        self.commit.now()
 
-    def _export_model_h5(self):
-        try:
-            model = self._build_keras_model()
-            model.save("custom_model.h5")
-            QMessageBox.information(self, "Success", "Model saved to custom_model.h5")
-        except Exception as e:
-            QMessageBox.warning(self, "Export Failed", str(e))
-
-    def _export_model_json(self):
+    def _export_model(self, fmt):
+        _, file_filter, _ = SAVE_FORMATS[fmt]
+        filename, _ = QFileDialog.getSaveFileName(self, "Export Model", self.last_dir, file_filter)
+        if not filename:
+            return
+        filename = with_extension(filename, fmt)
+        self.last_dir = os.path.dirname(filename)
         try:
             model = self._build_keras_model()
-            with open("custom_model.json", "w") as f:
-                f.write(model.to_json())
-            QMessageBox.information(self, "Success", "Model structure saved to custom_model.json")
         except Exception as e:
             QMessageBox.warning(self, "Export Failed", str(e))
+            return
+        for btn in self._export_buttons:
+            btn.setEnabled(False)
+        self.progressBarInit()
+        self._export_worker = SaveWorker(model, filename, fmt)
+        self._export_worker.progress.connect(self.progressBarSet)
+        self._export_worker.finished.connect(self._export_finished)
+        self._export_worker.failed.connect(self._export_failed)
+        self._export_worker.start()
+
+    def _export_done(self):
+        self.progressBarFinished()
+        for btn in self._export_buttons:
+            btn.setEnabled(True)
+
+    def _export_finished(self, filename, _size):
+        self._export_done()
+        QMessageBox.information(self, "Success", f"Model saved to {filename}")
+
+    def _export_failed(self, message):
+        self._export_done()
+        QMessageBox.warning(self, "Export Failed", message)
 
     def load_prebuilt_model(self, name):
         if name in PREBUILT_MODELS:
@@ -1,56 +1,116 @@
 import os
+import time
 import numpy as np
-import cv2
 
-from AnyQt.QtWidgets import QLabel
+from AnyQt.QtWidgets import QLabel, QSpinBox, QHBoxLayout, QCheckBox, QPushButton
 from PyQt5.QtCore import QThread, pyqtSignal
 
 from Orange.widgets.widget import OWWidget, Input, Output
-from Orange.data import Table, DiscreteVariable
+from Orange.widgets.settings import Setting
+from Orange.data import Table, Domain, DiscreteVariable, ContinuousVariable
+
+from orangecontrib.imagenets.util.image_loader import ImageBatchLoader
+from orangecontrib.imagenets.util.image_table import resolve_image_files
+from orangecontrib.imagenets.util.image_cache import default_cache, clear_default_cache
+from orangecontrib.imagenets.util.profiling import StageProfiler
+from orangecontrib.imagenets.util.lazy_import import preload
+from orangecontrib.imagenets.util.prediction_cache import PredictionCache, model_fingerprint, image_key
+from orangecontrib.imagenets.util.inference import as_backend, normalize_batch
+from orangecontrib.imagenets.util.model_profile import model_input_shape
 
 class ClassifyWorker(QThread):
     progress = pyqtSignal(int)
     finished = pyqtSignal(object)
+    failed = pyqtSignal(str)
 
-    def __init__(self, model, data):
+    def __init__(self, model, data, batch_size=64, prediction_cache=None, threads=0,
+                 image_cache=None):
         super().__init__()
         self.model = model
+        self.threads = threads
         self.data = data
+        self.batch_size = max(1, int(batch_size))
+        self.prediction_cache = prediction_cache
+        self.image_cache = image_cache
+        self.cache_hits = 0
+        self.threads_applied = True
+        self.stop_requested = False
+        self.profiler = StageProfiler("Classify")
+
+    def stop(self):
+        """Ask the run to end after the current batch; it then finishes with None."""
+        self.stop_requested = True
 
     def run(self):
-        domain = self.data.domain
-        image_col = None
-        origin = None
-
-        for var in domain.metas:
-            if var.attributes.get("type") == "image":
-                image_col = var
-                origin = var.attributes.get("origin")
-                break
-        image_col_index = domain.metas.index(image_col)
-        cv = domain.class_var
-
-        results = []
+        try:
+            probs = self.classify()
+        except Exception as e:
+            self.failed.emit(str(e))
+            return
+        self.profiler.finish()
+        self.finished.emit(probs)
+
+    def classify(self):
+        # one stat per image, shared by the prediction and image cache keys
+        paths, signatures = resolve_image_files(self.data, self.profiler)
+        exists = np.array([s is not None for s in signatures], dtype=bool)
         total = len(self.data)
+        backend = as_backend(self.model, self.threads)
+        self.threads_applied = backend.threads_applied
+        height, width, channels = model_input_shape(backend)
+        size = (width, height)
+        scale = backend.input_scale
+        # rows whose image is missing stay NaN, so outputs remain aligned with the input
+        probs = None
+        todo = np.flatnonzero(exists)
 
-        for i, row in enumerate(self.data):
-            rel_path = str(row.metas[image_col_index])
-            img_path = os.path.join(origin, rel_path)
-            if not os.path.exists(img_path):
-                continue
-            img = cv2.imread(img_path)
-            img = cv2.resize(img, (224, 224))
-            img = img.astype(np.float32) / 255.0
-            pred = self.model.predict(np.expand_dims(img, axis=0), verbose=0)
-            pred_class = cv.str_val(np.argmax(pred))
-            results.append(pred_class)
-            self.progress.emit(int(100 * (i + 1) / total))
-
-        self.finished.emit(results)
+        if self.prediction_cache is not None:
+            with self.profiler.stage("cache"):
+                # predictions depend on how pixels are scaled as well as on the model
+                fingerprint = f"{model_fingerprint(backend)}|{scale:g}"
+                keys = [image_key(path, size, sig) if sig is not None else None
+                        for path, sig in zip(paths, signatures)]
+                cached = self.prediction_cache.get_many(fingerprint, keys)
+            hits = [i for i, key in enumerate(keys) if key in cached]
+            if hits:
+                probs = np.full((total, len(cached[keys[hits[0]]])), np.nan, dtype=np.float32)
+                probs[hits] = np.stack([cached[keys[i]] for i in hits])
+            todo = np.array([i for i, key in enumerate(keys) if key is not None and key not in cached],
+                            dtype=int)
+            self.cache_hits = len(hits)
+
+        loader = ImageBatchLoader(paths[todo], batch_size=self.batch_size,
+                                  size=size, grayscale=channels == 1,
+                                  cache=self.image_cache, profiler=self.profiler,
+                                  signatures=[signatures[i] for i in todo])
+
+        for indices, images in loader:
+            if self.stop_requested:
+                loader.close()
+                return None
+            rows = todo[indices]
+            if images is not None:
+                start = time.perf_counter()
+                images = normalize_batch(images, scale)
+                with self.profiler.stage("inference"):
+                    preds = backend.predict(images.reshape((len(images), height, width, channels)))
+                if probs is None:
+                    probs = np.full((total, preds.shape[1]), np.nan, dtype=np.float32)
+                probs[rows] = preds
+                self.profiler.batch(time.perf_counter() - start, len(images))
+                if self.prediction_cache is not None:
+                    with self.profiler.stage("cache"):
+                        self.prediction_cache.put_many(fingerprint, zip((keys[i] for i in rows), preds))
+            if len(indices):
+                self.progress.emit(int(100 * (indices[-1] + 1) / max(len(todo), 1)))
+
+        if probs is None:
+            probs = np.full((total, 0), np.nan, dtype=np.float32)
+        return probs
 
 class OWImageNetClassify(OWWidget):
     name = "Classify Images"
-    description = "Classify images using a trained Keras model."
+    description = "Classify images using a trained Keras, TFLite or ONNX model."
     icon = "icons/classify.svg"
     priority = 20
 
@@ -60,19 +120,108 @@ class OWImageNetClassify(OWWidget):
 
     class Outputs:
         annotated_data = Output("Annotated Data", Table)
+        profile = Output("Profile", Table)
 
     want_basic_layout = True
     want_control_area = False
     want_main_area = False
 
+    batch_size = Setting(64)
+    top_k = Setting(1)
+    use_prediction_cache = Setting(True)
+    threads = Setting(0)
+    disk_cache_gb = Setting(0)
+
     def __init__(self):
         super().__init__()
         self.model = None
         self.data = None
+        self.worker = None
+        # superseded runs still going; kept referenced until they end
+        self._superseded = set()
 
         self.info_label = QLabel("Waiting for input...")
         self.layout().addWidget(self.info_label)
 
+        batch_layout = QHBoxLayout()
+        batch_layout.addWidget(QLabel("Batch Size:"))
+        self.batch_size_spin = QSpinBox()
+        self.batch_size_spin.setRange(1, 1024)
+        self.batch_size_spin.setValue(self.batch_size)
+        self.batch_size_spin.setToolTip("Number of images per forward pass.")
+        self.batch_size_spin.valueChanged.connect(self._on_batch_size_changed)
+        batch_layout.addWidget(self.batch_size_spin)
+        self.layout().addLayout(batch_layout)
+
+        top_k_layout = QHBoxLayout()
+        top_k_layout.addWidget(QLabel("Top-k Labels:"))
+        self.top_k_spin = QSpinBox()
+        self.top_k_spin.setRange(1, 10)
+        self.top_k_spin.setValue(self.top_k)
+        self.top_k_spin.setToolTip("Number of most probable labels to output per image.")
+        self.top_k_spin.valueChanged.connect(self._on_top_k_changed)
+        top_k_layout.addWidget(self.top_k_spin)
+        self.layout().addLayout(top_k_layout)
+
+        threads_layout = QHBoxLayout()
+        threads_layout.addWidget(QLabel("Inference Threads:"))
+        self.threads_spin = QSpinBox()
+        self.threads_spin.setRange(0, os.cpu_count() or 1)
+        self.threads_spin.setSpecialValueText("Auto")
+        self.threads_spin.setValue(self.threads)
+        self.threads_spin.setToolTip("Threads used by the inference runtime; Auto keeps its default.\n"
+                                     "Keras only applies this before TensorFlow has started.")
+        self.threads_spin.valueChanged.connect(self._on_threads_changed)
+        threads_layout.addWidget(self.threads_spin)
+        self.layout().addLayout(threads_layout)
+
+        cache_layout = QHBoxLayout()
+        self.cache_cb = QCheckBox("Cache predictions")
+        self.cache_cb.setChecked(self.use_prediction_cache)
+        self.cache_cb.setToolTip("Reuse stored predictions for images this model has already scored.")
+        self.cache_cb.stateChanged.connect(self._on_cache_changed)
+        cache_layout.addWidget(self.cache_cb)
+        clear_btn = QPushButton("Clear Cache")
+        clear_btn.setToolTip("Delete all stored predictions and decoded images.")
+        clear_btn.clicked.connect(self.clear_caches)
+        cache_layout.addWidget(clear_btn)
+        self.layout().addLayout(cache_layout)
+
+        disk_layout = QHBoxLayout()
+        disk_layout.addWidget(QLabel("Image Cache on Disk:"))
+        self.disk_cache_spin = QSpinBox()
+        self.disk_cache_spin.setRange(0, 1000)
+        self.disk_cache_spin.setSuffix(" GB")
+        self.disk_cache_spin.setSpecialValueText("Off")
+        self.disk_cache_spin.setValue(self.disk_cache_gb)
+        self.disk_cache_spin.setToolTip("Also keep decoded images on disk, up to this size, "
+                                        "so later sessions skip decoding.")
+        self.disk_cache_spin.valueChanged.connect(self._on_disk_cache_changed)
+        disk_layout.addWidget(self.disk_cache_spin)
+        self.layout().addLayout(disk_layout)
+
+        preload("keras")
+
+    def _on_batch_size_changed(self, value):
+        self.batch_size = value
+
+    def _on_top_k_changed(self, value):
+        self.top_k = value
+
+    def _on_threads_changed(self, value):
+        self.threads = value
+
+    def _on_cache_changed(self):
+        self.use_prediction_cache = self.cache_cb.isChecked()
+
+    def _on_disk_cache_changed(self, value):
+        self.disk_cache_gb = value
+
+    def clear_caches(self):
+        PredictionCache().clear()
+        clear_default_cache()
+        self.info_label.setText("Prediction and image caches cleared.")
+
     @Inputs.model
     def set_model(self, model):
         self.model = model
@@ -83,19 +232,87 @@ class OWImageNetClassify(OWWidget):
         self.data = data
         self.try_classify()
 
+    def supersede_worker(self):
+        old = self.worker
+        self.worker = None
+        if old is None or not old.isRunning():
+            return
+        # its results belong to the previous inputs and must not be annotated
+        old.stop()
+        old.progress.disconnect()
+        old.finished.disconnect()
+        old.failed.disconnect()
+        self._superseded.add(old)
+        old.finished.connect(lambda _, w=old: self._superseded.discard(w))
+        old.failed.connect(lambda _, w=old: self._superseded.discard(w))
+        self.progressBarFinished()
+
     def try_classify(self):
+        self.supersede_worker()
         if self.model is not None and self.data is not None:
+            self.error()
+            self.warning()
             self.info_label.setText("Classifying...")
             self.progressBarInit()
 
-            self.worker = ClassifyWorker(self.model, self.data)
+            cache = PredictionCache() if self.use_prediction_cache else None
+            self.worker = ClassifyWorker(self.model, self.data, self.batch_size, cache, self.threads,
+                                         default_cache(self.disk_cache_gb << 30))
             self.worker.progress.connect(self.progressBarSet)
             self.worker.finished.connect(self.handle_results)
+            self.worker.failed.connect(self.handle_failed)
             self.worker.start()
 
-    def handle_results(self, predictions):
-        var = DiscreteVariable('Prediction', values=[str(i) for i in sorted(set(predictions))])
-        annotated = self.data.add_column(var, predictions, to_metas=True)
+    def class_names(self, n_classes):
+        names = getattr(self.model, "class_names", None)
+        if names is not None and len(names) == n_classes:
+            return [str(name) for name in names]
+        cv = self.data.domain.class_var
+        if cv is not None and cv.is_discrete and len(cv.values) == n_classes:
+            return list(cv.values)
+        return [str(i) for i in range(n_classes)]
+
+    def annotate(self, probs):
+        n_rows, n_classes = probs.shape
+        names = self.class_names(n_classes)
+        k = min(self.top_k, n_classes)
+
+        missing = np.isnan(probs).any(axis=1) if n_classes else np.ones(n_rows, dtype=bool)
+        ranked = np.argsort(-np.nan_to_num(probs, nan=-np.inf), axis=1)[:, :k].astype(float)
+        ranked[missing] = np.nan
+
+        label_vars = [DiscreteVariable("Prediction" if i == 0 else f"Prediction {i + 1}", values=names)
+                      for i in range(k)]
+        prob_vars = [ContinuousVariable(f"P({name})") for name in names]
+
+        domain = self.data.domain
+        new_domain = Domain(domain.attributes, domain.class_vars,
+                            domain.metas + tuple(label_vars) + tuple(prob_vars))
+        metas = np.hstack([self.data.metas.astype(object), ranked.astype(object), probs.astype(object)])
+        return Table.from_numpy(new_domain, self.data.X, self.data.Y, metas, self.data.W,
+                                attributes=self.data.attributes, ids=self.data.ids)
+
+    def handle_results(self, probs):
+        if probs is None:
+            return
+        annotated = self.annotate(probs)
         self.Outputs.annotated_data.send(annotated)
         self.progressBarFinished()
-        self.info_label.setText("Classification complete.")
+        self.info_label.setText(f"Classification complete ({self.worker.cache_hits} cached).\n"
+                                + self.worker.profiler.format_summary())
+        self.Outputs.profile.send(self.worker.profiler.to_table())
+        if not self.worker.threads_applied:
+            self.warning("The thread setting takes effect for Keras models after restarting Orange; "
+                         "TensorFlow was already running.")
+
+    def handle_failed(self, message):
+        self.progressBarFinished()
+        self.info_label.setText("Classification failed.")
+        self.error(message)
+
+    def onDeleteWidget(self):
+        for worker in [self.worker, *self._superseded]:
+            if worker is not None:
+                worker.stop()
+                worker.wait()
+        super().onDeleteWidget()
@@ -4,7 +4,59 @@ from AnyQt.QtWidgets import QFileDialog, QLabel
 from Orange.widgets import gui
 from Orange.widgets.settings import Setting
 from Orange.widgets.widget import OWWidget, Output
-from keras.models import model_from_json, load_model
+from PyQt5.QtCore import QThread, pyqtSignal
+from orangecontrib.imagenets.util.lazy_import import lazy_import
+from orangecontrib.imagenets.util.model_profile import ModelProfileWorker, format_report
+from orangecontrib.imagenets.util.model_cache import default_model_cache, file_signature
+from orangecontrib.imagenets.util.inference import BACKEND_EXTENSIONS, load_backend
+
+kmodels = lazy_import("keras.models")
+
+def json_weights_path(json_path):
+    """
+    Weights saved next to an architecture file: ``<name>.weights.h5`` as Save
+    ImageNet writes them (Keras 3 requires the suffix), else the legacy
+    ``<name>_weights.h5``.
+    """
+    base = os.path.splitext(json_path)[0]
+    candidates = (base + ".weights.h5", base + "_weights.h5")
+    for path in candidates:
+        if os.path.exists(path):
+            return path
+    return candidates[0]
+
+def read_h5(filename):
+    return kmodels.load_model(filename)
+
+def read_json(json_path):
+    with open(json_path, "r") as f:
+        model = kmodels.model_from_json(f.read())
+    model.load_weights(json_weights_path(json_path))
+    return model
+
+def read_runtime(path):
+    return load_backend(path)
+
+class LoadWorker(QThread):
+    progress = pyqtSignal(int)
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+    def __init__(self, read, *paths):
+        super().__init__()
+        self.read = read
+        self.paths = paths
+
+    def run(self):
+        try:
+            self.progress.emit(10)
+            key = (self.read.__name__,) + file_signature(*self.paths)
+            model = default_model_cache().get_or_load(key, lambda: self.read(self.paths[0]))
+        except Exception as e:
+            self.failed.emit(str(e))
+            return
+        self.progress.emit(100)
+        self.finished.emit(model)
 
 class OWLoadKerasModel(OWWidget):
     name = "Load ImageNet"
@@ -24,9 +76,20 @@ class OWLoadKerasModel(OWWidget):
     def __init__(self):
         super().__init__()
         self.model = None
+        self.load_worker = None
+        self.profile_worker = None
+        # superseded loads still running; kept referenced until they end
+        self._superseded = set()
         self.mainArea.layout().addWidget(QLabel("Load Options:"))
         gui.button(self.mainArea, self, "Load from H5", callback=self.load_h5_dialog, width=250)
         gui.button(self.mainArea, self, "Load from JSON + Weights", callback=self.load_json_dialog, width=250)
+        gui.button(self.mainArea, self, "Load TFLite / ONNX", callback=self.load_runtime_dialog, width=250)
+        self.profile_button = gui.button(self.mainArea, self, "Profile on CPU", callback=self.profile_model, width=250)
+        self.status_label = QLabel()
+        self.mainArea.layout().addWidget(self.status_label)
+        self.profile_label = QLabel()
+        self.profile_label.setTextInteractionFlags(Qt.TextSelectableByMouse)
+        self.mainArea.layout().addWidget(self.profile_label)
         self.mainArea.layout().setAlignment(Qt.AlignTop)
         self.adjustSize()
 
@@ -35,9 +98,11 @@ class OWLoadKerasModel(OWWidget):
                 self.load_h5(self.load_file)
             elif self.load_type == 'json':
                 self.load_json(self.load_file)
+            elif self.load_type == 'runtime':
+                self.load_runtime(self.load_file)
         
     def load_h5_dialog(self):
-        filename, _ = QFileDialog.getOpenFileName(self, "Load Model from H5", self.last_dir, "H5 Files (*.h5)")
+        filename, _ = QFileDialog.getOpenFileName(self, "Load Keras Model", self.last_dir, "Keras Models (*.keras *.h5)")
         if filename:
             self.load_h5(filename)
 
@@ -45,12 +110,7 @@ class OWLoadKerasModel(OWWidget):
         self.last_dir = os.path.dirname(filename)
         self.load_file = filename
         self.load_type = 'h5'
-        try:
-            self.model = load_model(filename)
-            self.Outputs.model.send(self.model)
-            #self.setStatusMessage("Loaded model from: " + os.path.basename(filename))
-        except Exception as e:
-            self.error(str(e))
+        self.start_load(read_h5, filename)
 
     def load_json_dialog(self):
         json_path, _ = QFileDialog.getOpenFileName(self, "Load Model Architecture", self.last_dir, "JSON Files (*.json)")
@@ -59,18 +119,82 @@ class OWLoadKerasModel(OWWidget):
 
     def load_json(self, json_path):
         self.last_dir = os.path.dirname(json_path)
-        weights_path = os.path.splitext(json_path)[0] + "_weights.h5"
         self.load_file = json_path
         self.load_type = 'json'
-        try:
-            with open(json_path, "r") as f:
-                json_str = f.read()
-                self.model = model_from_json(json_str)
-            self.model.load_weights(weights_path)
-            self.Outputs.model.send(self.model)
-            #self.setStatusMessage(f"Loaded: {os.path.basename(json_path)} + weights")
-        except Exception as e:
-            self.error(str(e))
+        self.start_load(read_json, json_path, json_weights_path(json_path))
+
+    def load_runtime_dialog(self):
+        patterns = " ".join("*" + ext for ext in BACKEND_EXTENSIONS)
+        path, _ = QFileDialog.getOpenFileName(self, "Load Inference Model", self.last_dir,
+                                              f"Inference Models ({patterns})")
+        if path:
+            self.load_runtime(path)
+
+    def load_runtime(self, path):
+        self.last_dir = os.path.dirname(path)
+        self.load_file = path
+        self.load_type = 'runtime'
+        self.start_load(read_runtime, path)
+
+    def start_load(self, read, *paths):
+        self.error()
+        self.status_label.setText(f"Loading {os.path.basename(paths[0])}...")
+        self.progressBarInit()
+        # a newer request supersedes any load still running
+        old = self.load_worker
+        if old is not None and old.isRunning():
+            old.finished.disconnect()
+            old.failed.disconnect()
+            self._superseded.add(old)
+            # run() always ends by emitting exactly one of these
+            old.finished.connect(lambda _, w=old: self._superseded.discard(w))
+            old.failed.connect(lambda _, w=old: self._superseded.discard(w))
+        self.load_worker = LoadWorker(read, *paths)
+        self.load_worker.progress.connect(self.progressBarSet)
+        self.load_worker.finished.connect(self.handle_loaded)
+        self.load_worker.failed.connect(self.handle_failed)
+        self.load_worker.start()
+
+    def handle_loaded(self, model):
+        self.model = model
+        self.progressBarFinished()
+        self.status_label.setText(f"Loaded {os.path.basename(self.load_file)}")
+        self.Outputs.model.send(self.model)
+
+    def handle_failed(self, message):
+        self.progressBarFinished()
+        self.status_label.setText("")
+        self.error(message)
+
+    def onDeleteWidget(self):
+        for worker in [self.load_worker, self.profile_worker, *self._superseded]:
+            if worker is not None:
+                worker.wait()
+        super().onDeleteWidget()
+
+    def profile_model(self):
+        if self.model is None:
+            self.error("No model loaded.")
+            return
+        self.profile_button.setEnabled(False)
+        self.profile_label.setText("Profiling...")
+        self.progressBarInit()
+        self.profile_worker = ModelProfileWorker(self.model)
+        self.profile_worker.progress.connect(self.progressBarSet)
+        self.profile_worker.finished.connect(self._on_profiled)
+        self.profile_worker.failed.connect(self._on_profile_failed)
+        self.profile_worker.start()
+
+    def _on_profiled(self, report):
+        self.progressBarFinished()
+        self.profile_button.setEnabled(True)
+        self.profile_label.setText(format_report(report))
+        self.adjustSize()
+
+    def _on_profile_failed(self, message):
+        self.progressBarFinished()
+        self.profile_button.setEnabled(True)
+        self.profile_label.setText(f"Profiling failed: {message}")
 
 if __name__ == "__main__":
     from Orange.widgets.utils.widgetpreview import WidgetPreview
@@ -1,62 +1,171 @@
 import os
 from AnyQt.QtCore import Qt
+from AnyQt.QtWidgets import QLabel, QComboBox, QCheckBox
 from PyQt5.QtWidgets import QFileDialog
 
 from Orange.widgets import gui
 from Orange.widgets.widget import OWWidget, Input
 from Orange.widgets.settings import Setting
+from Orange.data import Table
+from orangecontrib.imagenets.util.model_analysis import human
+from orangecontrib.imagenets.util.inference import InferenceBackend
+from orangecontrib.imagenets.util.model_io import SAVE_FORMATS, SaveWorker, with_extension
+from orangecontrib.imagenets.util.tflite_export import QUANTIZATIONS, TFLiteExportWorker, format_report
 
 
 class OWSaveImageNet(OWWidget):
     name = "Save ImageNet"
-    description = "Save a trained Keras Sequential model, an ImageNet, to .h5 or .json format."
+    description = "Save a trained Keras model, an ImageNet, to .keras, .h5, weights-only, .json or TFLite format."
     icon = "icons/save.svg"
     priority = 20
 
     class Inputs:
         model = Input("Model", object, auto_summary=False)
+        calibration_data = Input("Calibration Images", Table)
 
     last_dir = Setting(os.path.expanduser("~"))
+    save_format = Setting("keras")
+    float16 = Setting(False)
+    quantization = Setting("dynamic")
     want_control_area = False
 
     def __init__(self):
         super().__init__()
         self.model = None
+        self.save_worker = None
+        self.calibration_data = None
 
-        gui.button(self.mainArea, self, "Save as .h5", callback=self.save_as_h5, width=250)
-        gui.button(self.mainArea, self, "Save as JSON", callback=self.save_as_json, width=250)
+        self.mainArea.layout().addWidget(QLabel("Format:"))
+        self.format_combo = QComboBox()
+        for fmt, (label, _, _) in SAVE_FORMATS.items():
+            self.format_combo.addItem(label, fmt)
+        self.format_combo.setCurrentIndex(max(0, self.format_combo.findData(self.save_format)))
+        self.format_combo.currentIndexChanged.connect(self.set_format)
+        self.mainArea.layout().addWidget(self.format_combo)
+
+        self.float16_cb = QCheckBox("Down-cast weights to float16")
+        self.float16_cb.setToolTip("Halves the file size; predictions may change slightly.")
+        self.float16_cb.setChecked(self.float16)
+        self.float16_cb.stateChanged.connect(lambda: setattr(self, "float16", self.float16_cb.isChecked()))
+        self.mainArea.layout().addWidget(self.float16_cb)
+
+        self.save_button = gui.button(self.mainArea, self, "Save...", callback=self.save, width=250)
+
+        self.mainArea.layout().addWidget(QLabel("TFLite quantisation:"))
+        self.quantization_combo = QComboBox()
+        for quantization, label in QUANTIZATIONS.items():
+            self.quantization_combo.addItem(label, quantization)
+        self.quantization_combo.setCurrentIndex(max(0, self.quantization_combo.findData(self.quantization)))
+        self.quantization_combo.currentIndexChanged.connect(
+            lambda: setattr(self, "quantization", self.quantization_combo.currentData()))
+        self.mainArea.layout().addWidget(self.quantization_combo)
+        self.tflite_button = gui.button(self.mainArea, self, "Export to TFLite...",
+                                        callback=self.export_tflite, width=250)
+
+        self.status_label = QLabel()
+        self.status_label.setTextInteractionFlags(Qt.TextSelectableByMouse)
+        self.mainArea.layout().addWidget(self.status_label)
+        self.set_format()
         self.mainArea.layout().setAlignment(Qt.AlignTop)
         self.adjustSize()
 
     @Inputs.model
     def set_model(self, model):
+        self.error()
+        if isinstance(model, InferenceBackend):
+            self.error(f"{model.name} models are already exported; only Keras models can be saved.")
+            model = None
         self.model = model
 
-    def save_as_h5(self):
+    @Inputs.calibration_data
+    def set_calibration_data(self, data):
+        self.calibration_data = data
+
+    def set_format(self):
+        self.save_format = self.format_combo.currentData()
+        # an architecture-only save has no weights to down-cast
+        self.float16_cb.setEnabled(self.save_format != "json")
+
+    def save(self):
+        self.error()
         if self.model is None:
             self.error("No model to save.")
             return
+        _, file_filter, _ = SAVE_FORMATS[self.save_format]
+        filename, _ = QFileDialog.getSaveFileName(self, "Save Keras Model", self.last_dir, file_filter)
+        if not filename:
+            return
+        filename = with_extension(filename, self.save_format)
+        self.last_dir = os.path.dirname(filename)
+        self.start_save(filename)
 
-        filename, _ = QFileDialog.getSaveFileName(self, "Save Keras Model", self.last_dir, "HDF5 files (*.h5)")
-        if filename:
-            if not filename.endswith(".h5"):
-                filename += ".h5"
-            self.model.save(filename)
-            self.last_dir = os.path.dirname(filename)
-
-    def save_as_json(self):
+    def export_tflite(self):
+        self.error()
         if self.model is None:
-            self.error("No model to save.")
+            self.error("No model to export.")
             return
+        if self.quantization == "int8" and self.calibration_data is None:
+            self.error("Full integer quantisation needs a Calibration Images input.")
+            return
+        filename, _ = QFileDialog.getSaveFileName(self, "Export to TFLite", self.last_dir,
+                                                  "TFLite files (*.tflite)")
+        if not filename:
+            return
+        if not filename.endswith(".tflite"):
+            filename += ".tflite"
+        self.last_dir = os.path.dirname(filename)
+        self.set_busy(True)
+        self.status_label.setText(f"Converting {os.path.basename(filename)}...")
+        self.progressBarInit()
+        self.save_worker = TFLiteExportWorker(self.model, filename, self.quantization,
+                                              self.calibration_data)
+        self.save_worker.progress.connect(self.progressBarSet)
+        self.save_worker.finished.connect(self.handle_exported)
+        self.save_worker.failed.connect(self.handle_failed)
+        self.save_worker.start()
+
+    def set_busy(self, busy):
+        self.save_button.setEnabled(not busy)
+        self.tflite_button.setEnabled(not busy)
+
+    def start_save(self, filename):
+        self.set_busy(True)
+        self.status_label.setText(f"Saving {os.path.basename(filename)}...")
+        self.progressBarInit()
+        self.save_worker = SaveWorker(self.model, filename, self.save_format, self.float16)
+        self.save_worker.progress.connect(self.progressBarSet)
+        self.save_worker.finished.connect(self.handle_saved)
+        self.save_worker.failed.connect(self.handle_failed)
+        self.save_worker.start()
+
+    def handle_saved(self, filename, size):
+        self.progressBarFinished()
+        self.set_busy(False)
+        self.status_label.setText(f"Saved {os.path.basename(filename)} ({human(size, binary=True)}B)")
+
+    def handle_exported(self, report):
+        self.progressBarFinished()
+        self.set_busy(False)
+        if report is None:
+            self.status_label.setText("Export stopped.")
+            return
+        self.status_label.setText(format_report(report))
+
+    def handle_failed(self, message):
+        self.progressBarFinished()
+        self.set_busy(False)
+        self.status_label.setText("")
+        self.error(message)
 
-        filename, _ = QFileDialog.getSaveFileName(self, "Save Keras Model Architecture", self.last_dir, "JSON files (*.json)")
-        if filename:
-            if not filename.endswith(".json"):
-                filename += ".json"
-            with open(filename, "w") as f:
-                f.write(self.model.to_json(indent=2))
-            self.last_dir = os.path.dirname(filename)
+    def onDeleteWidget(self):
+        # an interrupted save would leave a half-written model file
+        if self.save_worker is not None:
+            if isinstance(self.save_worker, TFLiteExportWorker):
+                # the slowest export; skip calibration or the latency comparison if still ahead
+                self.save_worker.stop()
+            self.save_worker.wait()
+        super().onDeleteWidget()
 
 if __name__ == "__main__":
     from Orange.widgets.utils.widgetpreview import WidgetPreview
-    WidgetPreview(OWSaveImageNet).run()
\ No newline at end of file
+    WidgetPreview(OWSaveImageNet).run()